@@ -0,0 +1,272 @@
+# api.py
+import json
+import logging
+import os
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import List, Optional, Union
+
+# Imported first: the module-level imports below are timed as the "imports" startup phase
+from src.startup import startup_phase, startup_report
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from langchain_core.documents import Document
+from pydantic import BaseModel
+
+from src.admission import AdmissionController, ServerBusyError
+from src.chain_manager import FssaiChainManager
+from src.hot_swap import IndexHotSwapper
+from src.hybrid_retriever import HybridRetriever
+from src.lexical_index import is_identifier_query
+from src.metrics import finish_trace, render, start_trace
+from src.query_batcher import QueryBatcher
+from src.single_flight import SingleFlight, question_key
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class QuestionRequest(BaseModel):
+    question: str
+    # Corpus indexes only: restrict retrieval to these documents (ids or file names) and/or dates
+    documents: Optional[List[str]] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+
+    def filters(self) -> dict:
+        filters = {"documents": self.documents, "since": self.since, "until": self.until}
+        return {key: value for key, value in filters.items() if value}
+
+
+def _sources(docs: List[Document]) -> List[dict]:
+    sources = []
+    for doc in docs:
+        source = {"page": doc.metadata.get("page"), "type": doc.metadata.get("type")}
+        if "document" in doc.metadata:
+            source["document"] = doc.metadata["document"]
+        sources.append(source)
+    return sources
+
+
+async def _chain_first(first, events, trace):
+    outcome = "cancelled"
+    try:
+        yield first
+        async for event in events:
+            yield event
+        outcome = "ok"
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        # Leaves the shared flight right away if the client went away
+        await events.aclose()
+        finish_trace(trace, outcome)
+
+
+def build_components(chain_manager: FssaiChainManager) -> SimpleNamespace:
+    """Builds the retrieval and generation pieces that belong to one loaded vector store."""
+    retriever = chain_manager.create_retriever()
+
+    def scope(filters: dict) -> dict:
+        """Returns the batcher arguments that restrict a query to the corpus documents matching filters."""
+        if not filters:
+            return {}
+        scoped = chain_manager.scoped_retriever(**filters)
+        if isinstance(scoped, HybridRetriever):
+            return {"vector_store": scoped.vector_store, "retriever": scoped}
+        return {"vector_store": scoped.vectorstore}
+
+    return SimpleNamespace(
+        answer_chain=chain_manager.create_answer_chain(),
+        batcher=QueryBatcher(
+            chain_manager.vector_store, retriever if isinstance(retriever, HybridRetriever) else None
+        ),
+        answer_cache=chain_manager.create_answer_cache() if config.ANSWER_CACHE_ENABLED else None,
+        lookup=chain_manager.additive_lookup if config.ADDITIVE_LOOKUP_DIRECT_ANSWERS else None,
+        scope=scope,
+        catalogue=chain_manager.corpus.catalogue if chain_manager.corpus is not None else None,
+    )
+
+
+def create_app(source: Union[FssaiChainManager, IndexHotSwapper]) -> FastAPI:
+    """Builds the JSON API around a chain manager, or around the snapshots served by a hot swapper."""
+    if isinstance(source, IndexHotSwapper):
+        swapper = source
+    else:
+        swapper = None
+        with startup_phase("chain build"):
+            static_components = build_components(source)
+    # Every request runs on the components of the snapshot that was current when it arrived
+    acquire = swapper.acquire if swapper is not None else lambda: nullcontext(static_components)
+    admission = AdmissionController()
+    # Identical questions in flight together share one retrieval and one LLM call
+    flights = SingleFlight()
+    app = FastAPI(title="FSSAI Food Additives API")
+
+    async def prepare(components: SimpleNamespace, question: str, filters: dict):
+        """Returns (finished answer or None, retrieved docs, cache vector to store the answer under).
+
+        Direct lookups and cached answers are corpus-wide, so filtered questions skip both.
+        """
+        if components.lookup is not None and not filters:
+            direct = components.lookup.direct_answer(question)
+            if direct is not None:
+                return direct, [], None
+        # The batched query embedding doubles as the answer cache key; a hit skips the search. As in the
+        # chat chain, identifier queries that BM25 serves ("INS 211" vs "INS 212") bypass the cache
+        identifier = components.batcher.retriever is not None and is_identifier_query(question)
+        answer_cache = components.answer_cache if not filters and not identifier else None
+        docs, embedding, cached = await components.batcher.retrieve(
+            question, answer_cache=answer_cache, **components.scope(filters)
+        )
+        if cached is not None:
+            return cached, [], None
+        return None, docs, (embedding if answer_cache is not None else None)
+
+    async def generate(question: str, filters: dict):
+        """Yields the answer as {"token": ...} events, then {"done": True, "sources": [...]}."""
+        async with admission.slot():
+            with acquire() as components:
+                text, docs, vector = await prepare(components, question, filters)
+                if text is not None:
+                    yield {"token": text}
+                else:
+                    parts = []
+                    async for token in components.answer_chain.astream({"question": question, "docs": docs}):
+                        parts.append(token)
+                        yield {"token": token}
+                    # Only completed answers are cached; a client disconnect closes this generator early
+                    if vector is not None:
+                        components.answer_cache.store(question, vector, "".join(parts))
+        yield {"done": True, "sources": _sources(docs)}
+
+    def check_filters(filters: dict):
+        """Rejects filters on a single-document store, unknown documents and filters matching nothing."""
+        if not filters:
+            return
+        with acquire() as components:
+            try:
+                components.scope(filters)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+
+    async def answer_events(request: QuestionRequest, endpoint: str):
+        """Starts (or joins an identical in-flight) answer; returns its first event, the stream and its trace.
+
+        Only the request that starts a computation takes an admission slot.
+        """
+        question, filters = request.question, request.filters()
+        check_filters(filters)
+        key = question_key(question)
+        if filters:
+            key += "\0" + json.dumps(filters, sort_keys=True)
+        # The leader's producer task inherits this trace, so its stages are recorded against it
+        trace = start_trace(endpoint)
+        events = flights.astream(key, lambda: generate(question, filters))
+        try:
+            first = await events.__anext__()
+        except ServerBusyError as e:
+            finish_trace(trace, "busy")
+            logging.warning(f"Request rejected, server busy: {e} ({admission.stats()})")
+            raise HTTPException(status_code=503, detail=config.BUSY_MESSAGE) from e
+        except Exception:
+            finish_trace(trace, "error")
+            raise
+        return first, events, trace
+
+    @app.post("/retrieve")
+    async def retrieve(request: QuestionRequest):
+        filters = request.filters()
+        check_filters(filters)
+        trace = start_trace("retrieve")
+        with acquire() as components:
+            docs, _, _ = await components.batcher.retrieve(request.question, **components.scope(filters))
+        finish_trace(trace)
+        return {"documents": [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs]}
+
+    @app.post("/answer")
+    async def answer(request: QuestionRequest):
+        first, events, trace = await answer_events(request, "answer")
+        parts, sources = [], []
+        async for event in _chain_first(first, events, trace):
+            parts.append(event.get("token", ""))
+            sources = event.get("sources", sources)
+        return {"answer": "".join(parts), "sources": sources}
+
+    @app.post("/answer/stream")
+    async def answer_stream(request: QuestionRequest):
+        """Streams newline-delimited JSON: {"token": ...} lines, then {"done": true, "sources": [...]}."""
+        first, events, trace = await answer_events(request, "answer_stream")
+
+        async def lines():
+            async for event in _chain_first(first, events, trace):
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/documents")
+    async def documents():
+        """Lists the documents of a corpus index with their metadata (empty for a single-PDF store)."""
+        with acquire() as components:
+            if components.catalogue is None:
+                return {"documents": []}
+            return {"documents": [
+                {key: entry.get(key) for key in ("id", "title", "date", "pages", "chunks", "indexed_at")}
+                for _, entry in sorted(components.catalogue.documents.items())
+            ]}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        """Prometheus metrics: stage latency histograms, request counts, token usage and cost."""
+        return render()
+
+    @app.get("/health")
+    async def health():
+        snapshot = swapper.stats() if swapper is not None else None
+        with acquire() as components:
+            return {
+                "status": "ok",
+                "snapshot": snapshot,
+                "admission": admission.stats(),
+                "batching": components.batcher.stats(),
+                "single_flight": flights.stats(),
+                "answer_cache": components.answer_cache.stats() if components.answer_cache is not None else None,
+            }
+
+    return app
+
+
+def load_app() -> FastAPI:
+    """Loads the configured vector store and builds the API around it (hot-swapped if enabled)."""
+    if config.HOT_SWAP_ENABLED:
+        swapper = IndexHotSwapper(build=build_components, close_value=lambda components: components.batcher.close())
+        swapper.start()
+        return create_app(swapper)
+    with startup_phase("vector store load"):
+        chain_manager = FssaiChainManager()
+    return create_app(chain_manager)
+
+
+def main():
+    """Starts the headless JSON API server."""
+    with startup_phase("env load"):
+        load_dotenv(override=True)
+    if not os.getenv("OPENAI_API_KEY"):
+        logging.error("OPENAI_API_KEY environment variable not set.")
+        return
+    try:
+        app = load_app()
+    except FileNotFoundError as e:
+        logging.error(e)
+        return
+    with startup_phase("import server"):
+        import uvicorn
+    startup_report("API")
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# batch_qa.py
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Set
+
+from dotenv import load_dotenv
+
+from src.chain_manager import FssaiChainManager
+from src.hybrid_retriever import HybridRetriever
+from src.vector_index import documents_at, search_positions
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def read_questions(path: Path) -> List[dict]:
+    """Reads {"id", "question"} items from a JSONL or CSV file; ids default to the 1-based row number.
+
+    An id that appears more than once is answered once, for its first question.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    items = {}
+    duplicates = 0
+    for number, row in enumerate(rows, start=1):
+        question = (row.get("question") or "").strip()
+        if not question:
+            continue
+        item_id = str(row.get("id") or number)
+        if item_id in items:
+            duplicates += 1
+            continue
+        items[item_id] = {"id": item_id, "question": question}
+    if duplicates:
+        logging.warning(f"Skipped {duplicates} questions whose id appeared earlier in {path}.")
+    return list(items.values())
+
+
+def finished_ids(output_path: Path) -> Set[str]:
+    """Returns the ids already answered successfully in an earlier (possibly interrupted) run."""
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def trim_partial_line(output_path: Path):
+    """Truncates a partial last line, left by a run killed mid-write, so appended records start on their own line."""
+    if not output_path.exists():
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        # Scans back from the end in blocks for the last newline, so large outputs are not read whole
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            block = f.read(position - start)
+            if position == end and block.endswith(b"\n"):
+                return
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+            logging.warning(f"Removed a partial last line from {output_path}.")
+
+
+class BatchAnswerer:
+    """Answers many questions: batched retrieval, then generation with bounded parallelism."""
+
+    def __init__(
+        self,
+        chain_manager: FssaiChainManager,
+        concurrency: int = config.BATCH_QA_CONCURRENCY,
+        filters: Optional[dict] = None,
+    ):
+        # filters (documents / since / until) restrict retrieval to part of a corpus index
+        self.retriever = chain_manager.create_retriever(**(filters or {}))
+        if isinstance(self.retriever, HybridRetriever):
+            self.vector_store = self.retriever.vector_store
+        else:
+            self.vector_store = self.retriever.vectorstore
+        self.answer_chain = chain_manager.create_answer_chain()
+        lookup = chain_manager.additive_lookup
+        # Direct lookups cover the whole corpus, so filtered runs always retrieve
+        self.lookup = lookup if config.ADDITIVE_LOOKUP_DIRECT_ANSWERS and not filters else None
+        self.concurrency = concurrency
+
+    def retrieve(self, items: List[dict]):
+        """Adds "docs" to every item with one embeddings request and one FAISS search for the whole batch."""
+        start = time.perf_counter()
+        for item in items:
+            item["direct"] = self.lookup.direct_answer(item["question"]) if self.lookup is not None else None
+        items = [item for item in items if item["direct"] is None]
+        hybrid = isinstance(self.retriever, HybridRetriever)
+        # Searched once per item: it decides the lexical fast path and is then fused with FAISS
+        lexical = {id(item): self.retriever.lexical_search(item["question"]) for item in items} if hybrid else {}
+        embedded = [
+            item for item in items
+            if not hybrid or self.retriever.needs_vector_search(item["question"], lexical[id(item)])
+        ]
+        positions = []
+        if embedded:
+            embeddings = self.vector_store.embeddings.embed_documents([item["question"] for item in embedded])
+            k = self.retriever.candidates if isinstance(self.retriever, HybridRetriever) else config.RETRIEVER_K
+            positions = search_positions(self.vector_store, embeddings, k)
+        vector_positions = {id(item): found for item, found in zip(embedded, positions)}
+
+        for item in items:
+            found = vector_positions.get(id(item), [])
+            if hybrid:
+                item["docs"] = self.retriever.retrieve_with_positions(item["question"], found, lexical[id(item)])
+            else:
+                item["docs"] = documents_at(self.vector_store, found)
+        # Retrieval is shared by the batch, so each item is charged an equal share
+        per_item_ms = (time.perf_counter() - start) * 1000 / max(1, len(items))
+        for item in items:
+            item["retrieval_ms"] = per_item_ms
+
+    def answer(self, item: dict) -> dict:
+        start = time.perf_counter()
+        record = {"id": item["id"], "question": item["question"]}
+        try:
+            if item.get("direct") is not None:
+                record["answer"], docs = item["direct"], []
+            else:
+                docs = item.pop("docs")
+                record["answer"] = self.answer_chain.invoke({"question": item["question"], "docs": docs})
+            record["sources"] = [
+                {"document": doc.metadata.get("document"), "page": doc.metadata.get("page"),
+                 "type": doc.metadata.get("type"), "content": doc.page_content}
+                for doc in docs
+            ]
+        except Exception as e:
+            record["error"] = str(e)
+        record["timings"] = {
+            "retrieval_ms": round(item.get("retrieval_ms", 0.0), 1),
+            "generation_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        return record
+
+    def run(self, items: List[dict], output_path: Path, chunk_size: int = config.BATCH_QA_CHUNK_SIZE):
+        """Answers the items and appends one JSON line per finished item to output_path."""
+        answered = failed = 0
+        trim_partial_line(output_path)
+        with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(self.concurrency) as pool:
+
+            def write(record: dict):
+                nonlocal answered, failed
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in record:
+                    failed += 1
+                    logging.error(f"Question {record['id']} failed: {record['error']}")
+                else:
+                    answered += 1
+
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start:start + chunk_size]
+                try:
+                    self.retrieve(chunk)
+                except Exception as e:
+                    # Only this chunk fails; its error records make a re-run retry it
+                    for item in chunk:
+                        write({"id": item["id"], "question": item["question"], "error": f"Retrieval failed: {e}"})
+                else:
+                    futures = [pool.submit(self.answer, item) for item in chunk]
+                    try:
+                        for future in as_completed(futures):
+                            write(future.result())
+                    except KeyboardInterrupt:
+                        for future in futures:
+                            future.cancel()
+                        logging.warning("Interrupted; re-run the same command to resume.")
+                        raise
+                logging.info(f"Progress: {answered + failed}/{len(items)} questions ({failed} failed).")
+        return answered, failed
+
+
+def main():
+    """Answers a file of questions and writes the answers as JSONL."""
+    parser = argparse.ArgumentParser(description="Answer a batch of questions from a JSONL or CSV file.")
+    parser.add_argument("input", type=Path, help="JSONL or CSV file with a 'question' (and optional 'id') field.")
+    parser.add_argument("-o", "--output", type=Path, help="JSONL output file (default: <input>.answers.jsonl).")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_QA_CONCURRENCY,
+                        help="Answers generated in parallel.")
+    parser.add_argument("--documents", nargs="+", help="Corpus index only: retrieve from these document ids or files.")
+    parser.add_argument("--since", help="Corpus index only: documents dated on or after this ISO date.")
+    parser.add_argument("--until", help="Corpus index only: documents dated on or before this ISO date.")
+    args = parser.parse_args()
+    output_path = args.output or args.input.with_suffix(".answers.jsonl")
+
+    load_dotenv(override=True)
+    if not os.getenv("OPENAI_API_KEY"):
+        logging.error("OPENAI_API_KEY environment variable not set.")
+        return
+
+    items = read_questions(args.input)
+    done = finished_ids(output_path)
+    pending = [item for item in items if item["id"] not in done]
+    logging.info(f"{len(items)} questions, {len(items) - len(pending)} already answered in {output_path}.")
+    if not pending:
+        return
+
+    try:
+        filters = {"documents": args.documents, "since": args.since, "until": args.until}
+        answerer = BatchAnswerer(
+            FssaiChainManager(), concurrency=args.concurrency,
+            filters={key: value for key, value in filters.items() if value},
+        )
+    except (FileNotFoundError, ValueError) as e:
+        logging.error(e)
+        return
+    start = time.perf_counter()
+    answered, failed = answerer.run(pending, output_path)
+    logging.info(
+        f"Answered {answered} questions ({failed} failed) in {time.perf_counter() - start:.1f}s; "
+        f"results in {output_path}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# benchmarks/components.py
+"""
+Offline benchmark of the ingestion and query components, using the stand-ins in
+benchmarks.stand_ins instead of OpenAI.
+
+Measures DocumentProcessor text/table extraction throughput, chunking rate, and, for each corpus
+size, index build time, vector store load and chain manager startup time, retrieval p50/p99 and
+answer latency / time to first token through the fake streaming model. Peak RSS is recorded
+after every section. The report is JSON; pass --baseline to flag regressions against an earlier one.
+
+Usage (from the project root):
+    python -m benchmarks.components --output bench.json
+    python -m benchmarks.components --pages 200 --sizes 1000,10000,50000 --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnablePassthrough
+
+from benchmarks.stand_ins import (
+    ADDITIVES, CATEGORIES, FakeStreamingChatModel, HashingEmbeddings, synthetic_chunks, write_regulation_pdf
+)
+from src.chain_manager import FssaiChainManager
+from src.document_processor import DocumentProcessor
+from src.vector_index import save_vector_store
+import config
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(values_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(values_ms)
+    return {
+        "p50_ms": ordered[len(ordered) // 2],
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_processing(work_dir: Path, pages: int) -> dict:
+    """Text and table extraction throughput of DocumentProcessor, and the chunking rate."""
+    pdf_path = work_dir / "regulation.pdf"
+    table_pages = write_regulation_pdf(str(pdf_path), pages)
+    processor = DocumentProcessor(pdf_path=str(pdf_path))
+
+    text_docs, text_seconds = timed(processor._extract_text)
+    table_docs, table_seconds = timed(processor._extract_tables)
+    docs = table_docs + text_docs
+    chunks, split_seconds = timed(processor.split, docs)
+    characters = sum(len(doc.page_content) for doc in docs)
+    return {
+        "pages": pages,
+        "table_pages": table_pages,
+        "tables_found": len(table_docs),
+        "text_pages_per_sec": pages / text_seconds,
+        "table_pages_per_sec": pages / table_seconds,
+        "text_extraction_seconds": text_seconds,
+        "table_extraction_seconds": table_seconds,
+        "chunks": len(chunks),
+        "chunks_per_sec": len(chunks) / split_seconds,
+        "chunking_chars_per_sec": characters / split_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def questions(count: int) -> List[str]:
+    """Natural-language questions that need the vector search."""
+    return [
+        f"What is the maximum permitted level of {ADDITIVES[i % len(ADDITIVES)][1]} in "
+        f"{CATEGORIES[i % len(CATEGORIES)].lower()}?"
+        for i in range(count)
+    ]
+
+
+def bench_corpus(work_dir: Path, size: int, queries: int, embeddings: HashingEmbeddings) -> dict:
+    """Index build, load and query latency for a synthetic corpus of size chunks."""
+    path = work_dir / f"store_{size}"
+    texts = synthetic_chunks(size)
+    metadatas = [{"source": "synthetic", "page": 1 + i // 4, "type": "text"} for i in range(size)]
+
+    vectors, embed_seconds = timed(embeddings.embed_documents, texts)
+    start = time.perf_counter()
+    vector_db = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+    save_vector_store(vector_db, path)
+    build_seconds = time.perf_counter() - start
+    del vector_db, vectors
+
+    llm = FakeStreamingChatModel()
+    manager, startup_seconds = timed(FssaiChainManager, path, embeddings, llm)
+    # Times a second, separate load; it is closed right away so its files do not stay open
+    reloaded, load_seconds = timed(manager._load_vector_store, embeddings)
+    if hasattr(reloaded.docstore, "close"):
+        reloaded.docstore.close()
+    del reloaded
+
+    retriever = manager.create_retriever()
+    asked = questions(queries)
+    identifiers = [f"INS {ADDITIVES[i % len(ADDITIVES)][0]}" for i in range(queries)]
+    retriever.invoke(asked[0])  # first query pays for lazily opened files
+
+    def latencies(items: List[str]) -> List[float]:
+        found = []
+        for item in items:
+            start = time.perf_counter()
+            retriever.invoke(item)
+            found.append((time.perf_counter() - start) * 1000)
+        return found
+
+    # Retrieval plus generation, without the answer cache so every question does the full work
+    rag_chain = {"docs": retriever, "question": RunnablePassthrough()} | manager.create_answer_chain()
+    answer_ms, ttft_ms = [], []
+    for question in asked:
+        start = time.perf_counter()
+        first = None
+        for _ in rag_chain.stream(question):
+            if first is None:
+                first = time.perf_counter()
+        answer_ms.append((time.perf_counter() - start) * 1000)
+        ttft_ms.append((first - start) * 1000)
+
+    result = {
+        "chunks": size,
+        "embed_seconds": embed_seconds,
+        "index_build_seconds": build_seconds,
+        "load_vector_store_seconds": load_seconds,
+        "startup_seconds": startup_seconds,
+        "retrieval": percentiles(latencies(asked)),
+        "identifier_retrieval": percentiles(latencies(identifiers)),
+        "answer": percentiles(answer_ms),
+        "time_to_first_token": percentiles(ttft_ms),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    manager.close()
+    return result
+
+
+def timings(report: dict, prefix: str = "") -> Dict[str, float]:
+    """Flattens the report to {"a.b.c": value} for every time metric (lower is better)."""
+    found = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            found.update(timings(value, name + "."))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and "chunks" in item:
+                    found.update(timings(item, f"{name}[{item['chunks']}]."))
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_seconds")):
+            found[name] = value
+    return found
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """Lists time metrics that got more than tolerance (e.g. 0.2 = 20%) slower than the baseline."""
+    current, previous = timings(report), timings(baseline)
+    return [
+        {"metric": name, "baseline": previous[name], "current": value, "ratio": value / previous[name]}
+        for name, value in sorted(current.items())
+        if previous.get(name) and value > previous[name] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingestion and retrieval components.")
+    parser.add_argument("--pages", type=int, default=50, help="Pages of the synthetic regulation PDF.")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated corpus sizes in chunks.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus size.")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the stand-in embeddings.")
+    parser.add_argument("--skip-processing", action="store_true", help="Skip the PDF extraction benchmark.")
+    parser.add_argument("--output", help="Also write the report as JSON to this file.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging.")
+    args = parser.parse_args()
+
+    # Per-query INFO logs would dominate the latencies being measured; the imported modules have
+    # already configured the root logger at INFO, so it has to be replaced
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    embeddings = HashingEmbeddings(dim=args.dim)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "faiss_index_type": config.FAISS_INDEX_TYPE,
+        "faiss_mmap": config.FAISS_MMAP,
+        "hybrid_retrieval": config.HYBRID_RETRIEVAL_ENABLED,
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        if not args.skip_processing:
+            report["processing"] = bench_processing(Path(work_dir), args.pages)
+        report["corpus"] = [
+            bench_corpus(Path(work_dir), int(size), args.queries, embeddings) for size in args.sizes.split(",")
+        ]
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = regressions(report, json.load(f), args.tolerance)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if report.get("regressions"):
+        raise SystemExit(f"{len(report['regressions'])} metrics regressed by more than {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
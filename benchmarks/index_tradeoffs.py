@@ -0,0 +1,97 @@
+# benchmarks/index_tradeoffs.py
+"""
+Compares FAISS index types against the exact flat index on a fixed query set.
+
+Reports recall@k, single-query latency, build time and index memory for every
+index type in src.vector_index.INDEX_TYPES.
+
+Usage (from the project root):
+    python -m benchmarks.index_tradeoffs                    # vectors of the ingested store
+    python -m benchmarks.index_tradeoffs --synthetic 50000  # random vectors, no store needed
+"""
+import argparse
+import json
+import logging
+import time
+
+import faiss
+import numpy as np
+
+from src.snapshots import active_store_path
+from src.vector_index import INDEX_TYPES, build_faiss_index, index_memory_bytes, load_flat_vectors
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def fixed_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Samples stored vectors and perturbs them, so queries resemble real ones but are not exact hits."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    noise = rng.normal(scale=0.01, size=(len(picks), vectors.shape[1])).astype("float32")
+    return vectors[picks] + noise
+
+
+def measure(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    """Measures recall@k against the exact neighbours and per-query latency."""
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found[0]) & set(expected))
+    latencies.sort()
+    return {
+        "recall_at_k": hits / (len(queries) * k),
+        "latency_ms_p50": latencies[len(latencies) // 2],
+        "latency_ms_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall / latency / memory trade-off of FAISS index types.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the vector store.")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=200, help="Size of the fixed query set.")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query (the retriever's default).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = np.random.default_rng(args.seed).random((args.synthetic, args.dim), dtype=np.float32)
+    else:
+        vectors = load_flat_vectors(active_store_path(config.VECTOR_STORE_PATH))
+        if vectors is None:
+            raise SystemExit(f"No vector store at {config.VECTOR_STORE_PATH}; run ingest.py or pass --synthetic N.")
+
+    queries = fixed_queries(vectors, args.queries, args.seed)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    report = {"vectors": int(len(vectors)), "dim": int(vectors.shape[1]), "queries": int(len(queries)),
+              "k": args.k, "results": []}
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+        result = {"index_type": index_type, "build_seconds": build_seconds,
+                  "memory_mb": index_memory_bytes(index) / 2 ** 20}
+        result.update(measure(index, queries, truth, args.k))
+        report["results"].append(result)
+
+    print(f"\n{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<8}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'memory MB':>12}{'build s':>10}")
+    for r in report["results"]:
+        print(f"{r['index_type']:<8}{r['recall_at_k']:>10.3f}{r['latency_ms_p50']:>10.3f}"
+              f"{r['latency_ms_p99']:>10.3f}{r['memory_mb']:>12.1f}{r['build_seconds']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# benchmarks/load_generator.py
+"""
+Open-loop load test: replays a question mix at increasing Poisson arrival rates and reports, per
+rate, throughput, end-to-end latency and time to first token (p50/p95/p99), error, busy and queue
+rates, and server CPU/RSS.
+
+Targets:
+    --target chain           the chain in this process, behind the same admission control as app.py
+    --target api --url URL   a running api.py (POST /answer/stream)
+    --target gradio --url URL  a running app.py, through gradio_client
+
+For reproducible offline runs point the OpenAI clients at benchmarks.mock_openai:
+    python -m benchmarks.mock_openai --port 8900 --embedding-latency-ms 30 --tokens-per-second 50 &
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock \\
+        python -m benchmarks.load_generator --target chain --synthetic 5000 --rates 2,4,8,16 --output load.json
+
+With --target chain the CPU/RSS figures include the load generator itself; for a server, pass its
+--server-pid (Linux only, read from /proc).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.stand_ins import ADDITIVES, CATEGORIES, HashingEmbeddings, synthetic_chunks
+from src.admission import AdmissionController, ServerBusyError
+from src.vector_index import save_vector_store
+import config
+
+# The chain logs every request at INFO, so the root logger stays at WARNING and progress uses its own logger
+logger = logging.getLogger("load_generator")
+
+
+def default_questions() -> List[str]:
+    """A mix of natural questions, identifier lookups and exact repeats (as real traffic has)."""
+    natural = [
+        f"What is the maximum permitted level of {name} in {category.lower()}?"
+        for (_, name), category in zip(ADDITIVES, CATEGORIES * 2)
+    ]
+    identifiers = [f"INS {ins}" for ins, _ in ADDITIVES[:5]]
+    repeats = natural[:3] * 3
+    mix = natural + identifiers + repeats
+    random.Random(7).shuffle(mix)
+    return mix
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {f"p{p}_ms": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in (50, 95, 99)}
+
+
+class ProcessSampler:
+    """Samples a process's CPU use and RSS from /proc while a load step runs."""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.available = pid is not None and os.path.exists(f"/proc/{pid}/stat")
+        self.ticks = os.sysconf("SC_CLK_TCK") if self.available else 100
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are the 14th and 15th
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def _rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    async def run(self, stop: asyncio.Event, interval: float = 0.5) -> Optional[dict]:
+        if not self.available:
+            return None
+        start_cpu, start = self._cpu_seconds(), time.perf_counter()
+        peak_rss = self._rss_mb()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            peak_rss = max(peak_rss, self._rss_mb())
+        elapsed = time.perf_counter() - start
+        return {"cpu_percent": 100 * (self._cpu_seconds() - start_cpu) / elapsed, "peak_rss_mb": peak_rss}
+
+
+class ChainTarget:
+    """The RAG chain in this process, admitted like app.py's chat handler."""
+
+    def __init__(self, store_path: Optional[Path] = None):
+        from src.chain_manager import FssaiChainManager
+
+        self.chain = FssaiChainManager(store_path).create_chain()
+        self.admission = AdmissionController()
+        self.pid = os.getpid()
+
+    async def ask(self, question: str) -> AsyncIterator[str]:
+        async with self.admission.slot():
+            async for token in self.chain.astream(question):
+                yield token
+
+    async def admission_stats(self) -> Optional[dict]:
+        return self.admission.stats()
+
+    async def close(self):
+        pass
+
+
+class ApiTarget:
+    """A running api.py server."""
+
+    def __init__(self, url: str, pid: Optional[int] = None):
+        self.client = httpx.AsyncClient(
+            base_url=url, timeout=httpx.Timeout(300.0), limits=httpx.Limits(max_connections=None)
+        )
+        self.pid = pid
+
+    async def ask(self, question: str) -> AsyncIterator[str]:
+        async with self.client.stream("POST", "/answer/stream", json={"question": question}) as response:
+            if response.status_code == 503:
+                raise ServerBusyError("503 from server")
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    event = json.loads(line)
+                    if "token" in event:
+                        yield event["token"]
+
+    async def admission_stats(self) -> Optional[dict]:
+        response = await self.client.get("/health")
+        return response.json().get("admission")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class GradioTarget:
+    """A running app.py, driven through gradio_client (one blocking client job per request)."""
+
+    def __init__(self, url: str, pid: Optional[int] = None, max_workers: int = 256):
+        from gradio_client import Client
+
+        self.client = Client(url, verbose=False)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.pid = pid
+
+    async def ask(self, question: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        outputs = iter(self.client.submit(question, api_name="/chat"))
+        finished = object()
+        sent = ""
+        while True:
+            # ChatInterface streams the growing answer, so each output extends the previous one
+            partial = await loop.run_in_executor(self.pool, next, outputs, finished)
+            if partial is finished:
+                return
+            if partial == config.BUSY_MESSAGE:
+                raise ServerBusyError("server answered with the busy message")
+            if len(partial) > len(sent):
+                yield partial[len(sent):]
+                sent = partial
+
+    async def admission_stats(self) -> Optional[dict]:
+        return None
+
+    async def close(self):
+        self.pool.shutdown(wait=False)
+
+
+async def one_request(target, question: str, in_flight: dict) -> dict:
+    start = time.perf_counter()
+    first_token = None
+    outcome = "ok"
+    in_flight["now"] += 1
+    in_flight["max"] = max(in_flight["max"], in_flight["now"])
+    try:
+        async for _ in target.ask(question):
+            if first_token is None:
+                first_token = time.perf_counter()
+    except ServerBusyError:
+        outcome = "busy"
+    except Exception as e:
+        outcome = "error"
+        logger.warning(f"Request failed: {e.__class__.__name__}: {e}")
+    finally:
+        in_flight["now"] -= 1
+    end = time.perf_counter()
+    return {
+        "outcome": outcome,
+        "latency_ms": (end - start) * 1000,
+        "ttft_ms": (first_token - start) * 1000 if first_token is not None else None,
+    }
+
+
+async def run_step(target, questions: List[str], rate: float, duration: float, seed: int) -> dict:
+    """Sends requests with exponential inter-arrival times at rate/s for duration seconds."""
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    before = await target.admission_stats()
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(ProcessSampler(target.pid).run(stop))
+    in_flight = {"now": 0, "max": 0}
+
+    tasks = []
+    start = loop.time()
+    next_arrival = start + rng.expovariate(rate)
+    while next_arrival - start < duration:
+        await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+        question = questions[len(tasks) % len(questions)]
+        tasks.append(asyncio.create_task(one_request(target, question, in_flight)))
+        next_arrival += rng.expovariate(rate)
+    results = await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    stop.set()
+    server = await sampler
+    after = await target.admission_stats()
+
+    ok = [result for result in results if result["outcome"] == "ok"]
+    offered = len(results)
+    step = {
+        "arrival_rate": rate,
+        "offered": offered,
+        "completed": len(ok),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "max_concurrency": in_flight["max"],
+        "latency": percentiles([result["latency_ms"] for result in ok]),
+        "time_to_first_token": percentiles([result["ttft_ms"] for result in ok if result["ttft_ms"] is not None]),
+        "error_rate": sum(result["outcome"] == "error" for result in results) / offered if offered else 0.0,
+        "busy_rate": sum(result["outcome"] == "busy" for result in results) / offered if offered else 0.0,
+        "queued_rate": (after["queued"] - before["queued"]) / offered if offered and before and after else None,
+        "server": server,
+    }
+    return step
+
+
+def build_synthetic_store(path: Path, size: int, dim: int):
+    """Builds a store whose vectors match what benchmarks.mock_openai returns for queries."""
+    embeddings = HashingEmbeddings(dim=dim)
+    texts = synthetic_chunks(size)
+    metadatas = [{"source": "synthetic", "page": 1 + i // 4, "type": "text"} for i in range(size)]
+    vector_db = FAISS.from_embeddings(list(zip(texts, embeddings.embed_documents(texts))), embeddings, metadatas)
+    save_vector_store(vector_db, path)
+
+
+def print_table(report: dict):
+    print(f"\n{report['target']}: {'rate/s':>7}{'done':>6}{'rps':>7}{'conc':>6}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'ttft p50':>10}{'err':>6}{'busy':>6}{'cpu %':>7}{'rss MB':>8}")
+    for step in report["steps"]:
+        latency = step["latency"] or {}
+        ttft = step["time_to_first_token"] or {}
+        server = step["server"] or {}
+        print(f"{'':{len(report['target']) + 2}}{step['arrival_rate']:>7.1f}{step['completed']:>6}"
+              f"{step['throughput_rps']:>7.2f}{step['max_concurrency']:>6}{latency.get('p50_ms', 0):>9.0f}"
+              f"{latency.get('p95_ms', 0):>9.0f}{latency.get('p99_ms', 0):>9.0f}{ttft.get('p50_ms', 0):>10.0f}"
+              f"{step['error_rate']:>6.0%}{step['busy_rate']:>6.0%}{server.get('cpu_percent', 0):>7.0f}"
+              f"{server.get('peak_rss_mb', 0):>8.0f}")
+
+
+async def run(args) -> dict:
+    if args.questions:
+        from batch_qa import read_questions
+
+        questions = [item["question"] for item in read_questions(Path(args.questions))]
+    else:
+        questions = default_questions()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.target == "chain":
+            store_path = None
+            if args.synthetic:
+                store_path = Path(work_dir) / "store"
+                build_synthetic_store(store_path, args.synthetic, args.dim)
+                # Stand-in query vectors must not end up in the shared on-disk embedding cache
+                config.EMBEDDING_CACHE_ENABLED = False
+            target = ChainTarget(store_path)
+        elif args.target == "api":
+            target = ApiTarget(args.url, args.server_pid)
+        else:
+            target = GradioTarget(args.url, args.server_pid)
+
+        report = {"target": args.target, "questions": len(questions), "duration_seconds": args.duration,
+                  "steps": []}
+        try:
+            for i, rate in enumerate(float(rate) for rate in args.rates.split(",")):
+                step = await run_step(target, questions, rate, args.duration, args.seed + i)
+                report["steps"].append(step)
+                logger.info(f"Rate {rate}/s: {step['completed']}/{step['offered']} completed, "
+                             f"{step['throughput_rps']:.2f} rps, latency {step['latency']}")
+        finally:
+            await target.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the chat chain, API or Gradio app.")
+    parser.add_argument("--target", choices=["chain", "api", "gradio"], default="chain")
+    parser.add_argument("--url", help="Server URL for --target api/gradio, e.g. http://127.0.0.1:8000.")
+    parser.add_argument("--server-pid", type=int, help="PID of the server to sample CPU/RSS from.")
+    parser.add_argument("--rates", default="1,2,4,8", help="Comma-separated arrival rates (requests/s).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per rate.")
+    parser.add_argument("--questions", help="JSONL or CSV question mix (default: built-in mix).")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="With --target chain, serve a synthetic store of N chunks instead of the ingested one.")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension of the synthetic store.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report as JSON to this file.")
+    args = parser.parse_args()
+    if args.target != "chain" and not args.url:
+        parser.error("--url is required for --target api/gradio")
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+    report = asyncio.run(run(args))
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/mock_openai.py
+"""
+Local OpenAI-compatible stand-in for load tests: /v1/embeddings and (streaming) /v1/chat/completions
+with configurable latency, so runs are reproducible offline.
+
+Embeddings come from benchmarks.stand_ins.HashingEmbeddings, so a store built with the same
+stand-in (see benchmarks.load_generator --synthetic) retrieves sensibly.
+
+Usage (from the project root):
+    python -m benchmarks.mock_openai --port 8900 --embedding-latency-ms 30 --tokens-per-second 50
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock python app.py
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+import uuid
+from typing import List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmarks.stand_ins import FakeStreamingChatModel, HashingEmbeddings
+
+
+def _input_texts(value) -> List[str]:
+    """Normalizes an embeddings "input": a string, strings, or token id arrays (tiktoken-encoded input)."""
+    if isinstance(value, str):
+        return [value]
+    if value and isinstance(value[0], int):
+        return [" ".join(map(str, value))]
+    return [item if isinstance(item, str) else " ".join(map(str, item)) for item in value]
+
+
+def create_app(
+    dim: int = 1536,
+    embedding_latency_ms: float = 0.0,
+    first_token_ms: float = 0.0,
+    tokens_per_second: float = 0.0,
+    answer: str = FakeStreamingChatModel().answer,
+) -> FastAPI:
+    """Builds the mock server; tokens_per_second=0 streams as fast as possible."""
+    embeddings = HashingEmbeddings(dim=dim)
+    words = answer.split(" ")
+    tokens = [word + " " for word in words[:-1]] + words[-1:]
+    token_delay = 1.0 / tokens_per_second if tokens_per_second else 0.0
+    app = FastAPI(title="Mock OpenAI API")
+    app.state.requests = {"embeddings": 0, "chat": 0}
+
+    @app.post("/v1/embeddings")
+    async def create_embeddings(request: Request):
+        body = await request.json()
+        app.state.requests["embeddings"] += 1
+        texts = _input_texts(body["input"])
+        if embedding_latency_ms:
+            await asyncio.sleep(embedding_latency_ms / 1000)
+        vectors = embeddings.embed_documents(texts)
+        if body.get("encoding_format") == "base64":
+            # The openai client asks for base64-packed float32 by default
+            vectors = [base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode() for vector in vectors]
+        prompt_tokens = sum(len(text.split()) for text in texts)
+        return {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def create_chat_completion(request: Request):
+        body = await request.json()
+        app.state.requests["chat"] += 1
+        model = body.get("model", "mock-chat")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_ms / 1000 + token_delay * len(tokens))
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            payload.update(extra)
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            await asyncio.sleep(first_token_ms / 1000)
+            for i, token in enumerate(tokens):
+                if i and token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"role": "assistant", "content": token} if i == 0 else {"content": token})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.requests
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension.")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--first-token-ms", type=float, default=0.0, help="Delay before the first streamed token.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming speed (0 = unthrottled).")
+    args = parser.parse_args()
+    app = create_app(args.dim, args.embedding_latency_ms, args.first_token_ms, args.tokens_per_second)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
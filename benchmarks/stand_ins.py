@@ -0,0 +1,181 @@
+# benchmarks/stand_ins.py
+"""
+Deterministic offline stand-ins for benchmarks: a hashing embedder, a streaming chat model and a
+generator of synthetic regulation-style PDFs and chunks. None of them touch the network.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import fitz  # PyMuPDF
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ADDITIVES = [
+    ("211", "Sodium benzoate"), ("200", "Sorbic acid"), ("124", "Ponceau 4R"), ("102", "Tartrazine"),
+    ("110", "Sunset yellow FCF"), ("951", "Aspartame"), ("621", "Monosodium glutamate"),
+    ("330", "Citric acid"), ("300", "Ascorbic acid"), ("220", "Sulphur dioxide"), ("250", "Sodium nitrite"),
+    ("322", "Lecithins"), ("412", "Guar gum"), ("415", "Xanthan gum"), ("955", "Sucralose"),
+]
+CATEGORIES = [
+    "Carbonated water based beverages", "Fruit juices and nectars", "Confectionery", "Processed cheese",
+    "Jams, jellies and marmalades", "Bakery wares", "Fermented milk products", "Processed meat products",
+    "Breakfast cereals", "Sauces and condiments", "Frozen desserts", "Snacks and savouries",
+]
+PHRASES = [
+    "shall not exceed the maximum level specified", "may be used in accordance with Good Manufacturing Practice",
+    "singly or in combination", "as specified in the Appendix", "expressed as the free acid",
+    "subject to the labelling requirements", "except where otherwise permitted", "calculated on the finished product",
+]
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words feature hashing: deterministic, and texts sharing words land close together.
+
+    latency adds a fixed delay per call to mimic an embeddings API round trip.
+    """
+
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Streams a fixed answer word by word, after first_token_delay and then token_delay per token."""
+
+    answer: str = (
+        "Sodium benzoate (INS 211) may be used in carbonated water based beverages up to 150 mg/kg, "
+        "singly or in combination with other benzoates, expressed as benzoic acid."
+    )
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> List[str]:
+        words = self.answer.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        prompt_tokens = sum(len(str(message.content)) for message in messages) // 4
+        completion_tokens = len(self._tokens())
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.first_token_delay + self.token_delay * len(self._tokens()))
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+
+def regulation_paragraph(rng: random.Random, sentences: int = 6) -> str:
+    """Returns regulation-style prose mentioning additives, food categories and limits."""
+    parts = []
+    for _ in range(sentences):
+        ins, name = rng.choice(ADDITIVES)
+        parts.append(
+            f"{name} (INS {ins}) in {rng.choice(CATEGORIES).lower()} {rng.choice(PHRASES)} "
+            f"of {rng.choice([50, 100, 150, 200, 300, 500, 1000])} mg/kg."
+        )
+    return " ".join(parts)
+
+
+def synthetic_chunks(count: int, seed: int = 42) -> List[str]:
+    """Returns count distinct chunk-sized texts."""
+    rng = random.Random(seed)
+    return [f"Regulation 3.1.{i}: " + regulation_paragraph(rng) for i in range(count)]
+
+
+def write_regulation_pdf(path: str, pages: int, table_every: int = 3, seed: int = 42) -> int:
+    """Writes a regulation-style PDF with a header, prose and, every table_every pages, an additive table.
+
+    Returns the number of pages carrying a table.
+    """
+    rng = random.Random(seed)
+    tables = 0
+    pdf = fitz.open()
+    for number in range(1, pages + 1):
+        page = pdf.new_page()
+        page.insert_text((50, 40), "FOOD SAFETY AND STANDARDS (FOOD PRODUCTS STANDARDS AND FOOD ADDITIVES)",
+                         fontsize=8)
+        top = 70
+        if table_every and number % table_every == 0:
+            tables += 1
+            columns = [50, 110, 260, 470]
+            header = ["INS No.", "Additive", "Food category", "Max level (mg/kg)"]
+            rows = [header] + [
+                [ins, name, rng.choice(CATEGORIES), str(rng.choice([50, 100, 150, 200, 300]))]
+                for ins, name in rng.sample(ADDITIVES, 8)
+            ]
+            for i, row in enumerate(rows):
+                y = top + i * 16
+                for x, cell in zip(columns, row):
+                    page.insert_text((x, y), cell, fontsize=8)
+                page.draw_line((45, y + 4), (560, y + 4), width=0.3)
+            top += len(rows) * 16 + 20
+        page.insert_textbox(fitz.Rect(50, top, 550, 790), regulation_paragraph(rng, sentences=12), fontsize=9)
+        page.insert_text((280, 820), f"Page {number}", fontsize=8)
+    pdf.save(path)
+    pdf.close()
+    return tables
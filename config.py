@@ -2,6 +2,11 @@
 import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# Settings below read the environment when this module is imported, so .env has to be loaded first
+load_dotenv(override=True)
+
 # Base directory of the project
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -17,14 +22,173 @@ VECTOR_STORE_PATH = BASE_DIR / "vector_store" / "faiss_index"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 100
 
+# Table extraction: Camelot runs over shards of pages in a process pool
+TABLE_EXTRACTION_WORKERS = os.cpu_count() or 1
+TABLE_SHARD_SIZE = 10  # pages per Camelot call
+
+# Table pre-classification: a PyMuPDF pass picks the pages Camelot runs on
+TABLE_DETECTION_ENABLED = True
+TABLE_DETECTION_MIN_RULING_LINES = 6  # ruled lines that mark a page as tabular
+TABLE_DETECTION_MIN_ALIGNED_ROWS = 4  # rows sharing column starts that mark a page as tabular
+TABLE_DETECTION_MIN_COLUMNS = 3  # cells a row needs to count as a table row
+TABLE_DETECTION_COLUMN_GAP = 15  # whitespace (points) that separates two cells
+
+# Ingest-time deduplication: near-duplicate chunks are dropped before embedding
+DEDUP_ENABLED = True
+DEDUP_SIMILARITY_THRESHOLD = 0.85  # estimated Jaccard similarity of word 3-gram shingles
+DEDUP_TABLE_CONTAINMENT = 0.8  # share of a text chunk's word pairs found in a table of the same page
+DEDUP_NUM_PERM = 128  # MinHash permutations
+DEDUP_BANDS = 32  # LSH bands; must divide DEDUP_NUM_PERM
+# Lines repeated at the top or bottom of this share of pages are stripped as headers/footers
+STRIP_PAGE_FURNITURE = True
+PAGE_FURNITURE_MIN_FRACTION = 0.3
+PAGE_FURNITURE_EDGE_LINES = 3  # lines at each end of a page that are checked
+
+# --- FAISS Index ---
+# Search index type: "flat" (exact), "hnsw", "ivf" or "ivfpq". Approximate indexes are
+# trained on the ingested vectors and stored next to the exact flat index.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_HNSW_M = 32  # graph neighbours per node
+FAISS_HNSW_EF_CONSTRUCTION = 200
+FAISS_HNSW_EF_SEARCH = 64
+FAISS_IVF_NLIST = None  # inverted lists; None picks ~4*sqrt(number of vectors)
+FAISS_IVF_NPROBE = 16  # lists scanned per query
+FAISS_PQ_M = 48  # PQ sub-quantizers; must divide the embedding dimension (1536)
+FAISS_PQ_NBITS = 8
+# Memory-map the index instead of reading it fully into RAM
+FAISS_MMAP = os.getenv("FAISS_MMAP", "false").lower() == "true"
+# Bytes of each SQLite store (chunks, BM25, additive lookup) read through a shared memory map
+SQLITE_MMAP_BYTES = 1 << 30
+
+# --- Hybrid Retrieval ---
+# BM25 index over the same chunks, combined with FAISS by reciprocal-rank fusion
+HYBRID_RETRIEVAL_ENABLED = True
+RETRIEVER_K = 4  # chunks passed to the prompt
+HYBRID_CANDIDATES = 20  # results taken from each of BM25 and FAISS before fusion
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Queries of at most this many tokens, mostly identifiers (e.g. "INS 211"), skip the embedding call
+LEXICAL_FAST_PATH_MAX_TOKENS = 4
+
 # --- Model Configuration ---
 # OpenAI model for embeddings
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# --- Embedding Cache ---
+# On-disk cache of embeddings shared by ingestion and querying
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = BASE_DIR / "vector_store" / "embedding_cache.sqlite"
+# Maximum number of cached vectors; least recently used entries are evicted beyond this
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000
+
+# --- Batch Embedding (ingestion) ---
+# Optional OpenAI-compatible endpoint, e.g. a local stand-in server for testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+EMBEDDING_BATCH_MAX_TOKENS = 50_000  # tokens packed into one embeddings request
+EMBEDDING_BATCH_MAX_SIZE = 512  # inputs per embeddings request
+EMBEDDING_MAX_CONCURRENCY = 4  # embeddings requests in flight
+EMBEDDING_MAX_RETRIES = 6
+EMBEDDING_MAX_BACKOFF = 60  # seconds
+# Completed batches are checkpointed here so a failed ingest can resume
+EMBEDDING_CHECKPOINT_PATH = BASE_DIR / "vector_store" / "embedding_checkpoint.sqlite"
+
+# --- Streaming Ingestion Pipeline ---
+PIPELINE_QUEUE_SIZE = 8  # items buffered between pipeline stages
+PIPELINE_EMBED_BATCH_SIZE = 256  # chunks handed to the batch embedder at a time
+
 # OpenAI model for chat completions
 CHAT_MODEL = "gpt-4o-mini"
 CHAT_TEMPERATURE = 0.7
 
+# --- Context Packing ---
+# Retrieved chunks are de-duplicated and packed into at most this many prompt tokens
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_DUPLICATE_THRESHOLD = 0.8  # share of a chunk's word pairs already in a better-ranked chunk
+CONTEXT_MIN_OVERLAP_CHARS = 20  # shortest shared text that merges two chunks of the same page
+
+# --- Semantic Answer Cache ---
+# Answers are reused for questions whose embedding is at least this cosine-similar
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# --- Structured Additive Lookup ---
+# Index of additive / INS number / food category / maximum level rows parsed from the tables
+ADDITIVE_LOOKUP_ENABLED = True
+# Answer unambiguous "maximum level of X in Y" questions straight from the index, without the LLM
+ADDITIVE_LOOKUP_DIRECT_ANSWERS = True
+ADDITIVE_LOOKUP_MAX_ROWS = 20  # rows injected into the prompt
+
+# --- Serving ---
+# One pooled HTTP client per process is shared by the chat and embedding clients
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_SECONDS = 30
+HTTP_TIMEOUT_SECONDS = 60
+# Admission control: answers generated at once, and requests allowed to wait for a slot
+MAX_INFLIGHT_LLM_CALLS = int(os.getenv("MAX_INFLIGHT_LLM_CALLS", "16"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "64"))
+QUEUE_TIMEOUT_SECONDS = 30
+BUSY_MESSAGE = "The assistant is answering a lot of questions right now. Please try again in a minute."
+
+# Identical questions in flight at the same time share one retrieval and LLM call
+SINGLE_FLIGHT_ENABLED = True
+
+# --- Headless API (api.py) ---
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Queries arriving within this window share one embeddings request and one FAISS search
+QUERY_BATCH_WINDOW_MS = 10
+QUERY_BATCH_MAX_SIZE = 64
+
+# --- Multi-Worker Serving (serve.py) ---
+# Worker processes share one memory-mapped copy of the vector store
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+CHAT_BASE_PORT = 7860  # chat UI workers listen on consecutive ports from here
+WORKER_RESTART_DELAY_SECONDS = 2
+WORKER_MAX_START_FAILURES = 3  # deaths before becoming ready that stop the supervisor
+
+# --- Batch Q&A (batch_qa.py) ---
+BATCH_QA_CONCURRENCY = 8  # answers generated in parallel
+BATCH_QA_CHUNK_SIZE = 64  # questions retrieved together with one embeddings request
+
+# --- Metrics & Tracing ---
+# app.py serves Prometheus metrics on this port; api.py exposes them at /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# When set, every request's stage timings are appended to this file as one JSON line
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+# (input, output) USD per million tokens, for the cost counter
+MODEL_PRICES_PER_MILLION = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+# --- Index Snapshots & Hot Swap ---
+SNAPSHOT_KEEP = 2  # previous snapshots kept next to the current one
+# Serving processes pick up a newly published snapshot without a restart
+HOT_SWAP_ENABLED = True
+SNAPSHOT_POLL_SECONDS = 10
+# Probe queries run against a new snapshot before it takes traffic (page-in and sanity check)
+WARMUP_QUERIES = [
+    "What is the maximum level of sodium benzoate in beverages?",
+    "INS 211",
+    "Which colours are permitted in confectionery?",
+]
+
+# --- Multi-Document Corpus ---
+# Index every PDF in CORPUS_DIR as its own shard (plus a catalogue) instead of the single PDF_PATH store
+CORPUS_ENABLED = os.getenv("CORPUS_ENABLED", "false").lower() == "true"
+CORPUS_DIR = Path(os.getenv("CORPUS_DIR", str(BASE_DIR / "data" / "corpus")))
+CORPUS_INDEX_PATH = BASE_DIR / "vector_store" / "corpus"
+CORPUS_BUILD_WORKERS = 2  # documents indexed in parallel; table extraction workers are split between them
+CORPUS_QUERY_WORKERS = 8  # threads that load shards and fan BM25 searches out across them
+CORPUS_VIEW_CACHE_SIZE = 32  # document subsets (request filters) whose merged view is kept, least recently used dropped
+
 # --- Chain & Memory Configuration ---
 # Key for conversational memory
 MEMORY_KEY = "chat_history"
@@ -4,6 +4,7 @@ Health check script for FSSAI Q&A Chatbot
 Run this script to verify your installation is working correctly.
 """
 
+import importlib.util
 import os
 import sys
 from pathlib import Path
@@ -33,33 +34,26 @@ def check_dependencies():
     """Check if required packages are installed."""
     print("\n📦 Checking dependencies...")
     
-    required_packages = [
-        'gradio',
-        'langchain',
-        'langchain_openai',
-        'langchain_community',
-        'openai',
-        'python_dotenv',
-        'camelot',
-        'fitz',  # PyMuPDF
-        'faiss',
-        'tiktoken'
-    ]
+    # Package name -> module it provides; modules are located, not imported, so the check stays fast
+    required_packages = {
+        'gradio': 'gradio',
+        'langchain': 'langchain',
+        'langchain_openai': 'langchain_openai',
+        'langchain_community': 'langchain_community',
+        'openai': 'openai',
+        'python_dotenv': 'dotenv',
+        'camelot': 'camelot',
+        'PyMuPDF': 'fitz',
+        'faiss': 'faiss',
+        'tiktoken': 'tiktoken'
+    }
     
     missing_packages = []
     
-    for package in required_packages:
-        try:
-            if package == 'fitz':
-                import fitz
-            elif package == 'python_dotenv':
-                import dotenv
-            elif package == 'camelot':
-                import camelot
-            else:
-                __import__(package)
+    for package, module in required_packages.items():
+        if importlib.util.find_spec(module) is not None:
             print(f"✅ {package}")
-        except ImportError:
+        else:
             print(f"❌ {package}")
             missing_packages.append(package)
     
@@ -1,20 +1,226 @@
 # ingest.py
+import argparse
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-
+from src.additive_index import AdditiveIndexBuilder
+from src.batch_embedder import BatchEmbedder
+from src.corpus import Catalogue, publish_catalogue, scan_corpus, shard_root
 from src.document_processor import DocumentProcessor
+from src.embedding_cache import EmbeddingCache, create_embedding_cache, create_embedding_model
+from src.index_manifest import IndexManifest
+from src.ingest_pipeline import IngestPipeline
+from src.metrics import span, stage_summary
+from src.snapshots import active_store_path, discard_snapshot, new_snapshot, publish_snapshot
+from src.vector_index import has_chunk_store, load_editable_vector_store, save_vector_store
 import config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def build_full_index(processor: DocumentProcessor, embedding_model, embedder: BatchEmbedder):
+    """Streams every page through the ingest pipeline into a new vector store plus its manifest."""
+    page_hashes = processor.page_hashes()
+    logging.info(f"Creating embeddings using '{config.EMBEDDING_MODEL}'...")
+    pipeline = IngestPipeline(processor, embedder)
+    vector_db, ids_by_page = pipeline.run(embedding_model)
+
+    if vector_db is None:
+        logging.error("No chunks were created. Halting ingestion.")
+        return None, None
+
+    manifest = IndexManifest(str(processor.pdf_path))
+    for page, page_hash in page_hashes.items():
+        manifest.set_page(page, page_hash, ids_by_page.get(page, []), pipeline.duplicates.get(page))
+    return vector_db, manifest
+
+def update_index(
+    processor: DocumentProcessor,
+    embedding_model,
+    embedder: BatchEmbedder,
+    manifest: IndexManifest,
+    source_path: Path,
+    page_hashes: Dict[int, str],
+):
+    """Re-indexes only the pages whose content changed since the manifest of the store at source_path.
+
+    page_hashes are the current page hashes (DocumentProcessor.page_hashes), which re-read every page.
+    """
+    changed, removed = manifest.diff(page_hashes)
+    if not changed and not removed:
+        logging.info("Vector store is up to date; no pages changed.")
+        return None, manifest
+
+    logging.info(f"Incremental update: {len(changed)} changed/new pages, {len(removed)} removed pages.")
+    vector_db = load_editable_vector_store(source_path, embedding_model)
+
+    # Re-extract and re-chunk only the changed pages; chunks that are still present are kept as they are
+    old_ids = set(manifest.chunk_ids(changed + removed))
+    pipeline = IngestPipeline(processor, embedder)
+    vector_db, ids_by_page = pipeline.run(
+        embedding_model, pages=changed, vector_db=vector_db, skip_ids=old_ids
+    )
+    new_ids = {chunk_id for ids in ids_by_page.values() for chunk_id in ids}
+
+    stale_ids = sorted(old_ids - new_ids)
+    if stale_ids:
+        vector_db.delete(stale_ids)
+    logging.info(f"Removed {len(stale_ids)} stale chunks and added {len(new_ids - old_ids)} new chunks.")
+
+    for page in changed:
+        manifest.set_page(page, page_hashes[page], ids_by_page.get(page, []), pipeline.duplicates.get(page))
+    for page in removed:
+        manifest.remove_page(page)
+    return vector_db, manifest
+
+def index_document(
+    pdf_path: Path,
+    root: Path,
+    embedding_model,
+    embedder: BatchEmbedder,
+    incremental: bool = False,
+    table_workers: int = config.TABLE_EXTRACTION_WORKERS,
+) -> Tuple[Optional[Path], Optional[IndexManifest]]:
+    """Indexes one PDF into a new snapshot of the store at root and publishes it.
+
+    Returns (published snapshot, its manifest); the snapshot is None when no page changed (with
+    incremental) or no chunks were created. A failed build discards its snapshot and re-raises.
+    """
+    processor = DocumentProcessor(pdf_path=pdf_path, table_workers=table_workers)
+    additive_index = None
+    # Everything is written into a new snapshot; servers only see it once it is published
+    source = active_store_path(root)
+    snapshot = new_snapshot(root)
+
+    try:
+        manifest = None
+        if incremental and has_chunk_store(source):
+            manifest = IndexManifest.load(source)
+        if manifest is not None and manifest.source == str(pdf_path):
+            page_hashes = processor.page_hashes()
+            if config.ADDITIVE_LOOKUP_ENABLED:
+                changed, removed = manifest.diff(page_hashes)
+                additive_index = AdditiveIndexBuilder(snapshot, replace_pages=changed + removed, base_path=source)
+                processor.table_sink = additive_index.add_table
+            vector_db, manifest = update_index(processor, embedding_model, embedder, manifest, source, page_hashes)
+        else:
+            if incremental:
+                logging.info(f"No usable manifest found for {pdf_path}; falling back to a full rebuild.")
+            if config.ADDITIVE_LOOKUP_ENABLED:
+                additive_index = AdditiveIndexBuilder(snapshot)
+                processor.table_sink = additive_index.add_table
+            vector_db, manifest = build_full_index(processor, embedding_model, embedder)
+
+        if vector_db is None:
+            if additive_index is not None:
+                additive_index.discard()
+            discard_snapshot(snapshot)
+            return None, manifest
+
+        with span("save"):
+            save_vector_store(vector_db, snapshot)
+        manifest.save(snapshot)
+        if additive_index is not None:
+            additive_index.commit()
+        publish_snapshot(root, snapshot)
+        return snapshot, manifest
+
+    except BaseException:
+        if additive_index is not None:
+            additive_index.discard()
+        discard_snapshot(snapshot)
+        raise
+
+def ingest_corpus(embedding_model, embedder: BatchEmbedder, incremental: bool = False) -> bool:
+    """Indexes the new and changed PDFs of CORPUS_DIR, one shard each, and publishes the catalogue.
+
+    Unchanged documents keep their shard, so adding a regulation builds only its own shard.
+    Returns False if any document failed; the others are still published.
+    """
+    root = config.CORPUS_INDEX_PATH
+    documents = scan_corpus(config.CORPUS_DIR)
+    if not documents:
+        logging.error(f"No PDFs found in {config.CORPUS_DIR}.")
+        return False
+    previous = Catalogue.load_current(root) or Catalogue()
+    # Unchanged files keep their shard, but take their title and date from the scan (metadata.json may have changed)
+    catalogue = Catalogue({
+        document: {**previous.documents[document], "title": entry["title"], "date": entry["date"]}
+        for document, entry in documents.items()
+        if previous.documents.get(document, {}).get("sha256") == entry["sha256"]
+    })
+    relabelled = [document for document, entry in catalogue.documents.items() if entry != previous.documents[document]]
+    to_build = [entry for document, entry in documents.items() if document not in catalogue.documents]
+    removed = sorted(set(previous.documents) - set(documents))
+    if not to_build and not removed and not relabelled:
+        logging.info(f"Corpus index is up to date ({len(catalogue.documents)} documents).")
+        return True
+    logging.info(
+        f"Corpus: {len(to_build)} new/changed documents to index, {len(catalogue.documents)} unchanged "
+        f"({len(relabelled)} with a new title or date), {len(removed)} removed."
+    )
+
+    workers = max(1, min(config.CORPUS_BUILD_WORKERS, len(to_build)))
+    table_workers = max(1, config.TABLE_EXTRACTION_WORKERS // workers)
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard") as pool:
+        futures = {
+            # A document that left the corpus and came back may still have its old shard, which is stale
+            pool.submit(
+                index_document, Path(entry["file"]), shard_root(root, entry["id"]), embedding_model, embedder,
+                incremental and entry["id"] in previous.documents, table_workers,
+            ): entry
+            for entry in to_build
+        }
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                snapshot, manifest = future.result()
+            except Exception as e:
+                snapshot, manifest = None, None
+                logging.error(f"Indexing {entry['file']} failed: {e}")
+            old = previous.documents.get(entry["id"])
+            if snapshot is None and manifest is not None and old is not None:
+                # The file changed but none of its pages did: keep the shard, record the new hash
+                entry.update(snapshot=old["snapshot"], chunks=old["chunks"], indexed_at=old["indexed_at"])
+                catalogue.documents[entry["id"]] = entry
+                continue
+            if snapshot is None:
+                failed.append(entry["id"])
+                # A document whose new version failed keeps serving its previous shard
+                if old is not None:
+                    catalogue.documents[entry["id"]] = old
+                continue
+            entry.update(
+                snapshot=snapshot.name,
+                chunks=sum(len(page["chunks"]) for page in manifest.pages.values()),
+                indexed_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            )
+            catalogue.documents[entry["id"]] = entry
+            logging.info(f"Indexed {entry['id']} ({entry['chunks']} chunks).")
+
+    if catalogue.documents:
+        publish_catalogue(root, catalogue)
+    if failed:
+        logging.error(f"{len(failed)} documents failed to index: {', '.join(sorted(failed))}")
+    return not failed
+
 def main():
     """Main function to ingest data and create the vector store."""
+    parser = argparse.ArgumentParser(description="Build the FAISS vector store from the FSSAI PDF.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-index pages that changed since the last ingestion."
+    )
+    args = parser.parse_args()
+
     load_dotenv(override=True)
-    
+
     # Check for OpenAI API key
     if not os.getenv("OPENAI_API_KEY"):
         logging.error("OPENAI_API_KEY environment variable not set.")
@@ -22,28 +228,40 @@ def main():
 
     logging.info("Starting data ingestion process...")
 
-    # 1. Process Documents
-    processor = DocumentProcessor(pdf_path=config.PDF_PATH)
-    chunks = processor.load_and_chunk()
-
-    if not chunks:
-        logging.error("No chunks were created. Halting ingestion.")
-        return
-        
-    # 2. Create Embeddings and Vector Store
     try:
-        logging.info(f"Creating embeddings using '{config.EMBEDDING_MODEL}'...")
-        embedding_model = OpenAIEmbeddings(model=config.EMBEDDING_MODEL)
-        
-        vector_db = FAISS.from_documents(chunks, embedding_model)
-        
-        # 3. Save Vector Store
-        config.VECTOR_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        vector_db.save_local(str(config.VECTOR_STORE_PATH))
-        logging.info(f"Vector store saved successfully at: {config.VECTOR_STORE_PATH}")
-        
+        cache = create_embedding_cache()
+        embedding_model = create_embedding_model(cache)
+        # Completed batches survive a failed run, so re-running resumes where it stopped
+        checkpoint = EmbeddingCache(config.EMBEDDING_CHECKPOINT_PATH, model=config.EMBEDDING_MODEL)
+        embedder = BatchEmbedder(cache=cache, checkpoint=checkpoint)
+
+        # 1. Process Documents, Create Embeddings and Save the Vector Store
+        if config.CORPUS_ENABLED:
+            succeeded = ingest_corpus(embedding_model, embedder, args.incremental)
+            saved_at = config.CORPUS_INDEX_PATH
+        else:
+            snapshot, manifest = index_document(
+                config.PDF_PATH, config.VECTOR_STORE_PATH, embedding_model, embedder, args.incremental
+            )
+            # No snapshot but a manifest means no page changed, and the published store is still current
+            succeeded, saved_at = snapshot is not None or manifest is not None, snapshot
+
+        logging.info(f"Embedding stats: {embedder.stats()}")
+        if cache is not None:
+            logging.info(f"Embedding cache stats: {cache.stats()}")
+        if not succeeded:
+            return
+
+        checkpoint.clear()
+        if saved_at is None:
+            logging.info(f"Vector store at {active_store_path(config.VECTOR_STORE_PATH)} is already up to date.")
+        else:
+            logging.info(f"Vector store saved successfully at: {saved_at}")
+        logging.info(f"Stage timings: {stage_summary()}")
+
     except Exception as e:
         logging.error(f"An error occurred during embedding or saving the vector store: {e}")
+        logging.error("Completed embedding batches were checkpointed; re-run ingest.py to resume.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
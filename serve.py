@@ -0,0 +1,102 @@
+# serve.py
+"""
+Serves the API (or the chat UI) from several worker processes under a supervisor.
+
+Every worker opens the same published vector store read-only: the FAISS index is memory-mapped
+and the chunk, BM25 and additive SQLite stores are read through mmap, so the index data sits in
+the OS page cache once and is shared by all workers instead of being copied into each of them.
+
+API workers share one listening port (SO_REUSEPORT) and the kernel balances connections between
+them. Chat UI workers listen on consecutive ports from CHAT_BASE_PORT, because a Gradio session
+has to stay on the process that holds its state; put a sticky load balancer in front of them.
+
+Usage:
+    python serve.py --workers 4
+    python serve.py --app chat --workers 2 --report workers.json
+"""
+import argparse
+import logging
+import os
+import socket
+from pathlib import Path
+
+from src.startup import startup_phase, startup_report
+from dotenv import load_dotenv
+
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    """Opens a listening socket that other workers can bind to the same port as well."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_api_worker(index: int, ready):
+    """Worker process: loads the index and serves the JSON API on the shared API port."""
+    with startup_phase("env load"):
+        load_dotenv(override=True)
+    with startup_phase("import api"):
+        import uvicorn
+        import api
+    app = api.load_app()
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    sock = _listen(config.API_HOST, config.API_PORT)
+    ready(**startup_report(f"API worker {index}"))
+    server.run(sockets=[sock])
+
+
+def run_chat_worker(index: int, ready):
+    """Worker process: loads the index and serves the chat UI on its own port."""
+    with startup_phase("env load"):
+        load_dotenv(override=True)
+    import app
+    demo = app.build_demo()
+
+    if config.METRICS_ENABLED:
+        from src.metrics import start_metrics_server
+        start_metrics_server(config.METRICS_PORT + index)
+    # launch() blocks once the server is up, so readiness is reported just before it
+    ready(**startup_report(f"chat worker {index}"))
+    demo.launch(
+        server_name="0.0.0.0",
+        server_port=config.CHAT_BASE_PORT + index,
+        inbrowser=False,
+        share=False,
+        app_kwargs={"title": "FSSAI Beige Bot"},
+    )
+
+
+def main():
+    """Parses arguments and runs the workers until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve the FSSAI bot from several worker processes.")
+    parser.add_argument("--app", choices=["api", "chat"], default="api", help="What each worker serves.")
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS, help="Number of worker processes.")
+    parser.add_argument("--report", type=Path, help="Write the per-worker startup and memory report to this JSON file.")
+    parser.add_argument("--report-every", type=float, default=0, help="Repeat the memory report every N seconds.")
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    if not os.getenv("OPENAI_API_KEY"):
+        logging.error("OPENAI_API_KEY environment variable not set.")
+        return
+    # Workers re-import config, so this makes every one of them map the index instead of reading it
+    os.environ["FAISS_MMAP"] = "true"
+
+    from src.supervisor import WorkerSupervisor
+    target = run_api_worker if args.app == "api" else run_chat_worker
+    supervisor = WorkerSupervisor(target, workers=args.workers, report_path=args.report, report_every=args.report_every)
+    logging.info(f"Starting {args.workers} {args.app} workers.")
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,8 @@ setup(
         'console_scripts': [
             'run-fssai-ingest=ingest:main',
             'run-fssai-chatbot=app:main',
+            'run-fssai-api=api:main',
+            'run-fssai-batch=batch_qa:main',
         ],
     },
 )
\ No newline at end of file
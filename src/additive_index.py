@@ -0,0 +1,274 @@
+# src/additive_index.py
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from src.chunk_store import connect_read_only
+import config
+
+FILENAME = "additives.sqlite"
+
+# Header keywords that identify the columns of the compendium's additive tables, checked in order
+COLUMN_PATTERNS = [
+    ("ins", re.compile(r"\bins\b|\bins\s*no|\be\s*no\b")),
+    ("category_no", re.compile(r"categ\w*\s*(no|number|code)|\bfcs\b")),
+    ("max_level", re.compile(r"max|level|limit|mg/kg|ppm")),
+    ("notes", re.compile(r"note|remark|comment")),
+    ("category", re.compile(r"categor")),
+    ("additive", re.compile(r"additive|\bname\b|substance|colou?r|preservative|sweetener|emulsifier")),
+    ("category", re.compile(r"\bfood\b|product")),
+]
+
+INS_PATTERN = re.compile(r"\b(?:ins|e)\s*-?\s*(\d{3,4}(?:\s*[a-z](?![a-z]))?(?:\s*\([ivx]+\))?)", re.IGNORECASE)
+CATEGORY_NO_PATTERN = re.compile(r"\b\d{1,2}(?:\.\d{1,2})+\b")
+MAX_LEVEL_QUESTION = re.compile(r"\b(max(imum)?|limit|level|how much|permitted amount)\b", re.IGNORECASE)
+STOPWORDS = {
+    "the", "of", "in", "for", "and", "or", "a", "an", "is", "are", "what", "which", "can", "be", "used",
+    "use", "using", "max", "maximum", "level", "levels", "permitted", "allowed", "limit", "limits", "food",
+    "foods", "products", "product", "how", "much", "list", "categories", "category", "where", "to", "with",
+}
+
+
+def normalize_term(text: str) -> str:
+    """Lowercases and strips punctuation so table cells and questions compare equal."""
+    return " ".join(re.sub(r"[^0-9a-z()]+", " ", str(text).lower()).split())
+
+
+def normalize_ins(text: str) -> str:
+    return re.sub(r"^(ins|e)", "", re.sub(r"\s+", "", str(text).lower()))
+
+
+def name_synonyms(name: str) -> Set[str]:
+    """Derives lookup terms from an additive name cell, e.g. 'Sorbic acid / Sorbates (E200)'."""
+    terms = {normalize_term(name)}
+    without_brackets = re.sub(r"\([^)]*\)", " ", name)
+    terms.add(normalize_term(without_brackets))
+    for part in re.split(r"[/;,]|\bor\b", without_brackets) + re.findall(r"\(([^)]*)\)", name):
+        terms.add(normalize_term(part))
+    return {term for term in terms if len(term) >= 3 and not term.isdigit()}
+
+
+class AdditiveIndexBuilder:
+    """Parses Camelot table rows into an additive -> food category -> maximum level index."""
+
+    def __init__(self, index_path: Path, replace_pages: Optional[List[int]] = None, base_path: Optional[Path] = None):
+        """Builds a new index, or (with replace_pages) updates a copy of the one in base_path (default index_path)."""
+        self.path = Path(index_path) / FILENAME
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.tmp_path.unlink(missing_ok=True)
+        if replace_pages is not None:
+            base = Path(base_path or index_path) / FILENAME
+            if base.exists():
+                shutil.copyfile(base, self.tmp_path)
+            else:
+                logging.warning("No additive lookup index to update; it will only cover the re-indexed pages.")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.tmp_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS additives (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, ins TEXT);"
+            "CREATE TABLE IF NOT EXISTS terms (term TEXT NOT NULL, additive_id INTEGER NOT NULL,"
+            " UNIQUE (term, additive_id));"
+            "CREATE TABLE IF NOT EXISTS limits (additive_id INTEGER NOT NULL, category_no TEXT, category TEXT,"
+            " max_level TEXT, notes TEXT, page INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_limits_additive ON limits (additive_id);"
+            "CREATE INDEX IF NOT EXISTS idx_limits_page ON limits (page);"
+        )
+        if replace_pages:
+            self._conn.executemany("DELETE FROM limits WHERE page = ?", [(page,) for page in replace_pages])
+        self.rows_added = 0
+
+    @staticmethod
+    def _columns(rows: List[List[str]]):
+        """Finds the header row and maps field name -> column index, or returns (None, None)."""
+        for header_index, row in enumerate(rows[:5]):
+            columns = {}
+            for column, cell in enumerate(row):
+                text = str(cell).lower()
+                for field, pattern in COLUMN_PATTERNS:
+                    if field not in columns and pattern.search(text):
+                        columns[field] = column
+                        break
+            if ("additive" in columns or "ins" in columns) and "max_level" in columns:
+                return header_index, columns
+        return None, None
+
+    def _additive_id(self, name: str, ins: str) -> int:
+        row = self._conn.execute("SELECT id, ins FROM additives WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            additive_id = self._conn.execute("INSERT INTO additives (name, ins) VALUES (?, ?)", (name, ins)).lastrowid
+        else:
+            additive_id = row[0]
+            if ins and not row[1]:
+                self._conn.execute("UPDATE additives SET ins = ? WHERE id = ?", (ins, additive_id))
+        terms = name_synonyms(name)
+        if ins:
+            terms.update({f"ins {ins}", f"e{ins}", f"e {ins}"})
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO terms (term, additive_id) VALUES (?, ?)", [(term, additive_id) for term in terms]
+        )
+        return additive_id
+
+    def add_table(self, page: int, rows: List[List[str]]):
+        """Adds the additive/limit rows of one extracted table."""
+        header_index, columns = self._columns(rows)
+        if columns is None:
+            return
+        current = {}
+        added = 0
+        with self._lock:
+            for row in rows[header_index + 1:]:
+                cells = {
+                    field: " ".join(str(row[column]).split())
+                    for field, column in columns.items() if column < len(row)
+                }
+                # Camelot leaves merged cells empty; they repeat the value above them
+                for field in ("additive", "ins", "category_no", "category"):
+                    if cells.get(field):
+                        current[field] = cells[field]
+                    elif field in current:
+                        cells[field] = current[field]
+                if not cells.get("max_level") or not (cells.get("additive") or cells.get("ins")):
+                    continue
+                ins = normalize_ins(cells["ins"]) if cells.get("ins") else ""
+                name = cells.get("additive") or f"INS {ins}"
+                additive_id = self._additive_id(name, ins)
+                self._conn.execute(
+                    "INSERT INTO limits (additive_id, category_no, category, max_level, notes, page) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (additive_id, cells.get("category_no"), cells.get("category"), cells["max_level"],
+                     cells.get("notes"), page),
+                )
+                added += 1
+            self.rows_added += added
+
+    def commit(self):
+        """Atomically replaces the live index with the one just built."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+        os.replace(self.tmp_path, self.path)
+        logging.info(f"Additive lookup index saved ({self.rows_added} limit rows added).")
+
+    def discard(self):
+        with self._lock:
+            self._conn.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class AdditiveLookup:
+    """Answers additive / INS / food category questions from the structured index."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.terms: Dict[str, Set[int]] = defaultdict(set)
+        for term, additive_id in self._connection().execute("SELECT term, additive_id FROM terms"):
+            self.terms[term].add(additive_id)
+        logging.info(f"Additive lookup index loaded with {len(self.terms)} terms.")
+
+    @classmethod
+    def open(cls, index_path: Path) -> Optional["AdditiveLookup"]:
+        path = Path(index_path) / FILENAME
+        if not path.exists():
+            logging.warning(f"No additive lookup index at {path}; structured lookups disabled.")
+            return None
+        return cls(path)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_read_only(self.path)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Closes every thread's connection, e.g. when a replaced index snapshot is released."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def find(self, question: str) -> List[dict]:
+        """Returns the table rows for the additives (and food categories) named in the question."""
+        return self._find(question)[0]
+
+    def _find(self, question: str):
+        """Returns (matching rows, whether they were narrowed to a food category, whether an INS number matched)."""
+        padded = f" {normalize_term(question)} "
+        matched_terms = [term for term in self.terms if f" {term} " in padded]
+        additive_ids = {additive_id for term in matched_terms for additive_id in self.terms[term]}
+        ins_ids = set()
+        for ins in INS_PATTERN.findall(question):
+            ins_ids.update(self.terms.get(f"ins {normalize_ins(ins)}", ()))
+        additive_ids |= ins_ids
+        if not additive_ids:
+            return [], False, False
+
+        placeholders = ",".join("?" * len(additive_ids))
+        rows = [
+            dict(zip(("name", "ins", "category_no", "category", "max_level", "notes", "page"), row))
+            for row in self._connection().execute(
+                "SELECT a.name, a.ins, l.category_no, l.category, l.max_level, l.notes, l.page "
+                f"FROM limits l JOIN additives a ON a.id = l.additive_id WHERE a.id IN ({placeholders}) "
+                "ORDER BY l.page",
+                list(additive_ids),
+            )
+        ]
+
+        # Narrow down to the food categories mentioned in the question, if any
+        additive_words = {word for term in matched_terms for word in term.split()}
+        question_words = set(padded.split()) - STOPWORDS - additive_words
+        scored = [(len(question_words & set(normalize_term(row["category"] or "").split())), row) for row in rows]
+        best = max((score for score, _ in scored), default=0)
+        if best > 0:
+            rows = [row for score, row in scored if score == best]
+        return rows[:config.ADDITIVE_LOOKUP_MAX_ROWS], best > 0, bool(ins_ids)
+
+    @staticmethod
+    def _describe(row: dict) -> str:
+        name = f"{row['name']} (INS {row['ins']})" if row["ins"] else row["name"]
+        category = " ".join(filter(None, [row["category_no"], row["category"]])) or "unspecified category"
+        notes = f"; notes: {row['notes']}" if row["notes"] else ""
+        return f"{name} | {category} | maximum level: {row['max_level']}{notes} (page {row['page']})"
+
+    def context_for(self, question: str) -> str:
+        """Formats the exact matching rows as extra context for the prompt."""
+        rows = self.find(question)
+        if not rows:
+            return ""
+        lines = "\n".join(f"- {self._describe(row)}" for row in rows)
+        return f"Exact rows from the compendium's additive tables:\n{lines}"
+
+    def direct_answer(self, question: str) -> Optional[str]:
+        """Answers 'maximum level of X in Y' questions straight from the index when the match is unambiguous."""
+        if not MAX_LEVEL_QUESTION.search(question):
+            return None
+        rows, category_matched, ins_matched = self._find(question)
+        # One shared word is too weak a signal to skip the model: the question must name the food
+        # category (or its number) exactly, or identify the additive by its INS number
+        padded = f" {normalize_term(question)} "
+        category_numbers = set(CATEGORY_NO_PATTERN.findall(question))
+        exact_rows = [
+            row for row in rows
+            if (row["category"] and f" {normalize_term(row['category'])} " in padded)
+            or (row["category_no"] or "").strip() in category_numbers
+        ]
+        if exact_rows:
+            rows = exact_rows
+        elif not (category_matched and ins_matched):
+            return None
+        if len(rows) > 3:
+            return None
+        lines = "\n".join(f"- {self._describe(row)}" for row in rows)
+        return f"According to the FSSAI food additives compendium tables:\n{lines}"
@@ -0,0 +1,70 @@
+# src/admission.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import config
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when a request cannot be admitted because the server is saturated."""
+
+
+class AdmissionController:
+    """Bounds the answers generated concurrently and the requests waiting for a slot.
+
+    Requests beyond max_in_flight wait in line; once max_queued are already waiting, or a
+    request waited longer than queue_timeout seconds, it is rejected with ServerBusyError.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = config.MAX_INFLIGHT_LLM_CALLS,
+        max_queued: int = config.MAX_QUEUED_REQUESTS,
+        queue_timeout: float = config.QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        # Created on first use so it belongs to the serving event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queued:
+                self.rejected += 1
+                raise ServerBusyError(f"{self.waiting} requests already waiting")
+            self.waiting += 1
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise ServerBusyError(f"no slot became free within {self.queue_timeout}s") from None
+            finally:
+                self.waiting -= 1
+        else:
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,192 @@
+# src/answer_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+
+import config
+
+
+class SemanticAnswerCache:
+    """Caches answers and serves them for questions whose embedding is close to a cached one.
+
+    Entries expire after ttl_seconds, the least recently used ones are evicted beyond max_entries,
+    and everything is dropped when index_version() reports a rebuilt vector store.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        index_version: Callable[[], Any] = lambda: None,
+        threshold: float = config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        max_entries: int = config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = config.ANSWER_CACHE_TTL_SECONDS,
+    ):
+        self.embeddings = embeddings
+        self.index_version = index_version
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Question vectors live in the rows of one preallocated matrix (allocated on the first store,
+        # once the dimension is known); a lookup is a single matrix-vector product without copying
+        self._matrix: Optional[np.ndarray] = None
+        self._created = np.full(max_entries, -np.inf)  # -inf marks a free slot
+        self._questions: List[Optional[str]] = [None] * max_entries
+        self._answers: List[Optional[str]] = [None] * max_entries
+        # question -> slot, least recently used first
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._version = index_version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _release(self, question: str):
+        slot = self._slots.pop(question)
+        self._created[slot] = -np.inf
+        self._questions[slot] = self._answers[slot] = None
+        self._free.append(slot)
+
+    def _clear(self):
+        for question in list(self._slots):
+            self._release(question)
+
+    def _check_version(self):
+        """Drops all entries if the vector store was rebuilt since they were cached."""
+        version = self.index_version()
+        if version != self._version:
+            self._clear()
+            self._version = version
+            self.invalidations += 1
+            logging.info("Vector store changed; answer cache invalidated.")
+
+    def _match(self, vector: np.ndarray) -> Optional[str]:
+        """Returns the closest fresh cached answer above the similarity threshold."""
+        with self._lock:
+            self._check_version()
+            if not self._slots:
+                self.misses += 1
+                return None
+            similarities = self._matrix @ vector
+            # Free and expired slots never match
+            similarities[time.time() - self._created > self.ttl_seconds] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self._slots.move_to_end(self._questions[best])
+            self.hits += 1
+            logging.info(f"Answer cache hit (similarity {similarities[best]:.3f}).")
+            return self._answers[best]
+
+    def _put(self, question: str, vector: np.ndarray, answer: str):
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                self._clear()
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if question in self._slots:
+                self._release(question)
+            if not self._free:
+                expired = np.nonzero(time.time() - self._created > self.ttl_seconds)[0]
+                for slot in expired:
+                    if self._questions[slot] is not None:
+                        self._release(self._questions[slot])
+                if not self._free:
+                    self._release(next(iter(self._slots)))
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._created[slot] = time.time()
+            self._questions[slot] = question
+            self._answers[slot] = answer
+            self._slots[question] = slot
+
+    def lookup(self, question: str) -> Tuple[Optional[str], np.ndarray]:
+        """Returns (cached answer or None, question vector)."""
+        vector = self._normalize(self.embeddings.embed_query(question))
+        return self._match(vector), vector
+
+    async def alookup(self, question: str) -> Tuple[Optional[str], np.ndarray]:
+        vector = self._normalize(await self.embeddings.aembed_query(question))
+        return self._match(vector), vector
+
+    def lookup_vector(self, embedding: List[float]) -> Tuple[Optional[str], np.ndarray]:
+        """Like lookup, for a question whose embedding is already known."""
+        vector = self._normalize(embedding)
+        return self._match(vector), vector
+
+    def store(self, question: str, vector: Union[np.ndarray, List[float]], answer: str):
+        """Caches a complete answer under the question's (possibly unnormalized) embedding."""
+        if answer:
+            self._put(question, self._normalize(vector), answer)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._slots),
+            "invalidations": self.invalidations,
+        }
+
+
+class CachedAnswerChain(Runnable):
+    """Runs a question -> answer chain behind a SemanticAnswerCache.
+
+    A hit returns the cached answer without retrieval or an LLM call. Only answers that were
+    generated completely are cached, so a cancelled stream never leaves a partial answer behind.
+    """
+
+    def __init__(self, chain: Runnable, cache: SemanticAnswerCache):
+        self.chain = chain
+        self.cache = cache
+
+    def invoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        answer, vector = self.cache.lookup(input)
+        if answer is not None:
+            return answer
+        answer = self.chain.invoke(input, config, **kwargs)
+        self.cache.store(input, vector, answer)
+        return answer
+
+    async def ainvoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        answer, vector = await self.cache.alookup(input)
+        if answer is not None:
+            return answer
+        answer = await self.chain.ainvoke(input, config, **kwargs)
+        self.cache.store(input, vector, answer)
+        return answer
+
+    def stream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[str]:
+        answer, vector = self.cache.lookup(input)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        for token in self.chain.stream(input, config, **kwargs):
+            parts.append(token)
+            yield token
+        self.cache.store(input, vector, "".join(parts))
+
+    async def astream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[str]:
+        answer, vector = await self.cache.alookup(input)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        async for token in self.chain.astream(input, config, **kwargs):
+            parts.append(token)
+            yield token
+        self.cache.store(input, vector, "".join(parts))
@@ -0,0 +1,205 @@
+# src/batch_embedder.py
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+import openai
+import tiktoken
+
+from src.embedding_cache import EmbeddingCache
+from src.http_clients import get_http_client
+from src.metrics import record_usage, span
+import config
+
+# Hard per-input limit of the OpenAI embedding models
+MAX_INPUT_TOKENS = 8191
+
+
+def load_encoding(model: str):
+    """Returns the tiktoken encoding for a model, or None if it cannot be loaded (e.g. offline)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.warning(f"Could not load tiktoken encoding for '{model}' ({e}); estimating token counts.")
+        return None
+
+
+class EmbeddingBatchError(RuntimeError):
+    """Raised when a batch still fails after all retries."""
+
+
+class BatchEmbedder:
+    """Embeds texts in token-packed batches, sent concurrently with adaptive backoff."""
+
+    def __init__(
+        self,
+        model: str = config.EMBEDDING_MODEL,
+        client: Optional[openai.OpenAI] = None,
+        cache: Optional[EmbeddingCache] = None,
+        checkpoint: Optional[EmbeddingCache] = None,
+        max_batch_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_size: int = config.EMBEDDING_BATCH_MAX_SIZE,
+        max_concurrency: int = config.EMBEDDING_MAX_CONCURRENCY,
+        max_retries: int = config.EMBEDDING_MAX_RETRIES,
+    ):
+        self.model = model
+        # Retries are handled here so that 429s can also throttle the other workers
+        self.client = client or openai.OpenAI(
+            base_url=config.OPENAI_BASE_URL, max_retries=0, http_client=get_http_client()
+        )
+        self.cache = cache
+        self.checkpoint = checkpoint
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.encoding = load_encoding(model)
+
+        # Adaptive concurrency: halved on every 429, grown back by one per successful call
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+        self.api_calls = 0
+        self.rate_limited = 0
+        self.reused = 0
+
+    def _prepare(self, text: str) -> Tuple[str, int]:
+        """Returns the text (truncated to the model's input limit) and its token count."""
+        if self.encoding is None:
+            # Rough estimate without a tokenizer: ~4 characters per token
+            text = text[:MAX_INPUT_TOKENS * 2]
+            return text, max(1, len(text) // 4)
+        tokens = self.encoding.encode(text)
+        if len(tokens) > MAX_INPUT_TOKENS:
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = self.encoding.decode(tokens)
+        return text, max(1, len(tokens))
+
+    def pack_batches(self, texts: List[str]) -> List[List[int]]:
+        """Greedily packs text indices into batches under the token and size budgets."""
+        batches, current, current_tokens = [], [], 0
+        for index, text in enumerate(texts):
+            _, tokens = self._prepare(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _acquire(self):
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def _release(self, throttled: bool):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(1, self._limit // 2)
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1)
+            self._condition.notify_all()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retrying, honouring Retry-After when the server sends one."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(config.EMBEDDING_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random())
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embeds one batch, retrying transient failures."""
+        # A token spans at least one character, so only long texts can exceed the limit
+        inputs = [text if len(text) <= MAX_INPUT_TOKENS else self._prepare(text)[0] for text in texts]
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            throttled = False
+            try:
+                with span("embedding_request"):
+                    response = self.client.embeddings.create(model=self.model, input=inputs)
+                with self._condition:
+                    self.api_calls += 1
+                if response.usage is not None:
+                    record_usage(self.model, response.usage.prompt_tokens)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except openai.RateLimitError as e:
+                throttled = True
+                error = e
+                with self._condition:
+                    self.rate_limited += 1
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                error = e
+            finally:
+                self._release(throttled)
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, error)
+            logging.warning(f"Embedding batch failed ({error.__class__.__name__}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+        raise EmbeddingBatchError(f"Embedding batch of {len(texts)} texts failed after {self.max_retries} retries: {error}")
+
+    def _stored(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Looks texts up in the checkpoint, then in the shared embedding cache."""
+        vectors = [None] * len(texts)
+        for store in (self.checkpoint, self.cache):
+            if store is None:
+                continue
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if not missing:
+                break
+            for i, vector in zip(missing, store.get_many([texts[i] for i in missing])):
+                vectors[i] = vector
+        return vectors
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds all texts, reusing stored vectors and checkpointing each completed batch."""
+        vectors = self._stored(texts)
+        pending = [i for i, vector in enumerate(vectors) if vector is None]
+        self.reused += len(texts) - len(pending)
+
+        batches = [[pending[i] for i in batch] for batch in self.pack_batches([texts[i] for i in pending])]
+        logging.info(
+            f"Embedding {len(pending)} texts in {len(batches)} batches "
+            f"({len(texts) - len(pending)} reused from cache/checkpoint)."
+        )
+        if not batches:
+            return vectors
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(self._embed_batch, [texts[i] for i in batch]): batch for batch in batches}
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    batch = futures[future]
+                    batch_vectors = future.result()
+                    batch_texts = [texts[i] for i in batch]
+                    for store in (self.checkpoint, self.cache):
+                        if store is not None:
+                            store.put_many(batch_texts, batch_vectors)
+                    for i, vector in zip(batch, batch_vectors):
+                        vectors[i] = vector
+                    if done % 10 == 0 or done == len(batches):
+                        logging.info(f"Embedded {done}/{len(batches)} batches.")
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        return vectors
+
+    def stats(self) -> dict:
+        return {"api_calls": self.api_calls, "rate_limited": self.rate_limited, "reused": self.reused}
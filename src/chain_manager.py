@@ -1,73 +1,90 @@
 # src/chain_manager.py
 import logging
 import os
-from langchain.chains import ConversationalRetrievalChain
-from langchain_openai import ChatOpenAI  # Corrected import
-from langchain_openai import OpenAIEmbeddings  # Corrected import
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_community.vectorstores import FAISS  # Corrected import
-
-import config
-
-class FssaiChainManager:
-    """Manages the creation of the conversational retrieval chain."""
-
-    def __init__(self):
-        if not os.path.exists(config.VECTOR_STORE_PATH):
-            raise FileNotFoundError(
-                f"Vector store not found at {config.VECTOR_STORE_PATH}. "
-                f"Please run `ingest.py` first to create it."
-            )
-        self.vector_store = self._load_vector_store()
-
-    def _load_vector_store(self) -> FAISS:
-        """Loads the FAISS vector store from the local path."""
-        logging.info("Loading vector store...")
-        embedding_model = OpenAIEmbeddings(model=config.EMBEDDING_MODEL)
-        # allow_dangerous_deserialization is needed for FAISS with langchain>0.1.14
-        return FAISS.load_local(
-            str(config.VECTOR_STORE_PATH), 
-            embedding_model, 
-            allow_dangerous_deserialization=True 
-        )
-
-# src/chain_manager.py
-import logging
-import os
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+from pathlib import Path
+from typing import List, Optional
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain_community.vectorstores import FAISS
 
+from src.additive_index import AdditiveLookup
+from src.answer_cache import CachedAnswerChain, SemanticAnswerCache
+from src.context_packer import ContextPacker
+from src.corpus import CorpusStore, is_corpus
+from src.embedding_cache import create_embedding_model
+from src.http_clients import get_async_http_client, get_http_client
+from src.hybrid_retriever import HybridRetriever
+from src.lexical_index import LexicalIndex, is_identifier_query
+from src.metrics import MetricsCallbackHandler
+from src.single_flight import SingleFlight, SingleFlightChain
+from src.snapshots import active_store_path, default_store_root, lease_snapshot
+from src.vector_index import load_vector_store, store_version
 import config
 
 class FssaiChainManager:
     """Manages the creation of the conversational retrieval chain."""
 
-    def __init__(self):
-        if not os.path.exists(config.VECTOR_STORE_PATH):
+    def __init__(self, path: Optional[Path] = None, embedding_model=None, llm=None):
+        """Opens the vector store at path (default VECTOR_STORE_PATH, or CORPUS_INDEX_PATH with
+        CORPUS_ENABLED), or its published snapshot.
+
+        embedding_model and llm replace the OpenAI models, e.g. with offline stand-ins in benchmarks.
+        """
+        self.path = active_store_path(Path(path or default_store_root()))
+        if not os.path.exists(self.path):
             raise FileNotFoundError(
-                f"Vector store not found at {config.VECTOR_STORE_PATH}. "
+                f"Vector store not found at {self.path}. "
                 f"Please run `ingest.py` first to create it."
             )
-        self.vector_store = self._load_vector_store()
+        # Keeps ingestion from pruning the snapshot while this manager reads it
+        self._lease = lease_snapshot(self.path)
+        self.llm = llm
+        # Overlapping and duplicated chunks are merged before they reach the prompt; shared by every answer chain
+        self.context_packer = ContextPacker()
+        self.answer_cache = None
+        self._scoped_retrievers = OrderedDict()
+        self._scoped_retrievers_lock = threading.Lock()
+        if is_corpus(self.path):
+            # One shard per document, searched together as a single store
+            self.corpus = CorpusStore(self.path, embedding_model or create_embedding_model())
+            self.vector_store = self.corpus.view.vector_store
+            self.additive_lookup = self.corpus.view.additive_lookup
+            self.lexical_index = self.corpus.view.lexical
+        else:
+            self.corpus = None
+            self.vector_store = self._load_vector_store(embedding_model)
+            self.additive_lookup = AdditiveLookup.open(self.path) if config.ADDITIVE_LOOKUP_ENABLED else None
+            self.lexical_index = LexicalIndex.open(self.path) if config.HYBRID_RETRIEVAL_ENABLED else None
+
+    def close(self):
+        """Closes the store's files; the manager and its chains must not be used afterwards."""
+        if self.corpus is not None:
+            self.corpus.close()
+        else:
+            for resource in (self.vector_store.docstore, self.lexical_index, self.additive_lookup):
+                if hasattr(resource, "close"):
+                    resource.close()
+        if self._lease is not None:
+            self._lease.close()
 
-    def _load_vector_store(self) -> FAISS:
+    def _load_vector_store(self, embedding_model=None) -> FAISS:
         """Loads the FAISS vector store from the local path."""
         logging.info("Loading vector store...")
-        embedding_model = OpenAIEmbeddings(model=config.EMBEDDING_MODEL)
-        # allow_dangerous_deserialization is needed for FAISS with langchain>0.1.14
-        return FAISS.load_local(
-            str(config.VECTOR_STORE_PATH), 
-            embedding_model, 
-            allow_dangerous_deserialization=True 
-        )
+        # Query embeddings go through the same on-disk cache as ingestion
+        embedding_model = embedding_model or create_embedding_model()
+        # Opens the configured index type (FAISS_INDEX_TYPE), memory-mapped if FAISS_MMAP is set
+        return load_vector_store(self.path, embedding_model)
 
-    def create_chain(self):
-        """Creates and returns the conversational retrieval chain."""
-        logging.info("Creating conversational retrieval chain...")
-        
+    def create_answer_chain(self):
+        """Creates the generation half of the chain: {"question", "docs"} -> answer.
+
+        Callers that retrieve on their own (e.g. the batched API server) invoke it directly.
+        """
         # 1. Define Prompt Template
         prompt = ChatPromptTemplate.from_messages([
             ("system", config.SYSTEM_PROMPT),
@@ -75,25 +92,111 @@ class FssaiChainManager:
         ])
         
         # 2. Instantiate LLM
-        llm = ChatOpenAI(
+        llm = self.llm or ChatOpenAI(
             temperature=config.CHAT_TEMPERATURE, 
             model=config.CHAT_MODEL,
-            streaming=True
+            base_url=config.OPENAI_BASE_URL,
+            streaming=True,
+            # Token usage arrives in the last streamed chunk and feeds the token/cost counters
+            stream_usage=True,
+            callbacks=[MetricsCallbackHandler()] if config.METRICS_ENABLED else None,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
         )
-        
-        # 3. Create the retrieval chain using modern LangChain patterns
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
-        
-        retriever = self.vector_store.as_retriever()
-        
-        # Create the chain
-        rag_chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-        
+
+        context = itemgetter("docs") | RunnableLambda(self.context_packer.pack)
+
+        lookup = self.additive_lookup
+        if lookup is not None:
+            # Exact table rows for the additives named in the question go ahead of the retrieved chunks
+            rows = itemgetter("question") | RunnableLambda(lookup.context_for)
+            context = {"rows": rows, "docs": context} | RunnableLambda(
+                lambda parts: "\n\n".join(filter(None, [parts["rows"], parts["docs"]]))
+            )
+
+        return {"context": context, "question": itemgetter("question")} | prompt | llm | StrOutputParser()
+
+    def create_retriever(
+        self, documents: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None
+    ):
+        """Creates the retriever: BM25 + FAISS when the lexical index exists, FAISS alone otherwise.
+
+        On a corpus index, documents (ids or file names) and since/until (ISO dates) restrict it to
+        the matching shards; a ValueError names documents that do not exist.
+        """
+        vector_store, lexical_index = self.vector_store, self.lexical_index
+        if documents or since or until:
+            if self.corpus is None:
+                raise ValueError("Filtering by document or date needs a corpus index (CORPUS_ENABLED).")
+            view = self.corpus.select(documents, since, until)
+            vector_store, lexical_index = view.vector_store, view.lexical
+        if lexical_index is not None:
+            # Identifier queries skip the query embedding entirely
+            return HybridRetriever(vector_store=vector_store, lexical=lexical_index)
+        return vector_store.as_retriever(search_kwargs={"k": config.RETRIEVER_K})
+
+    def scoped_retriever(
+        self, documents: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None
+    ):
+        """Like create_retriever, but returns the same retriever for every request with the same scope.
+
+        Retrievers of the CORPUS_VIEW_CACHE_SIZE most recently used scopes are kept, like the views they search.
+        """
+        key = tuple(self.corpus.catalogue.select(documents, since, until)) if self.corpus is not None else ()
+        with self._scoped_retrievers_lock:
+            retriever = self._scoped_retrievers.get(key)
+            if retriever is not None:
+                self._scoped_retrievers.move_to_end(key)
+                return retriever
+            retriever = self.create_retriever(documents, since, until)
+            self._scoped_retrievers[key] = retriever
+            if len(self._scoped_retrievers) > config.CORPUS_VIEW_CACHE_SIZE:
+                self._scoped_retrievers.popitem(last=False)
+        return retriever
+
+    def create_answer_cache(self):
+        """Creates the semantic answer cache, which is invalidated when the vector store is rebuilt."""
+        if self.corpus is not None:
+            # Catalogue snapshots are never rewritten in place; a new one comes with a new manager
+            index_version = lambda: self.corpus.version
+        else:
+            index_version = lambda: store_version(self.path)
+        self.answer_cache = SemanticAnswerCache(self.vector_store.embeddings, index_version=index_version)
+        return self.answer_cache
+
+    def create_chain(self):
+        """Creates and returns the conversational retrieval chain."""
+        logging.info("Creating conversational retrieval chain...")
+
+        self.retriever = self.create_retriever()
+        self.answer_chain = self.create_answer_chain()
+        rag_chain = {"docs": self.retriever, "question": RunnablePassthrough()} | self.answer_chain
+
+        lookup = self.additive_lookup
+        if lookup is not None and config.ADDITIVE_LOOKUP_DIRECT_ANSWERS:
+            # Unambiguous maximum-level questions are answered from the index without an LLM call
+            llm_chain = rag_chain
+
+            def answer_directly(question):
+                # Looked up once; returning the chain instead makes RunnableLambda run (and stream) it
+                answer = lookup.direct_answer(question)
+                return llm_chain if answer is None else answer
+
+            rag_chain = RunnableLambda(answer_directly)
+
+        if config.ANSWER_CACHE_ENABLED:
+            # Repeated and near-duplicate questions are answered without retrieval or generation
+            cached_chain = CachedAnswerChain(rag_chain, self.create_answer_cache())
+            if self.lexical_index is not None:
+                # Identifier queries would need an embedding just for the cache lookup, and "INS 211"
+                # vs "INS 212" are near-identical to an embedding model, so they bypass the cache
+                cached_chain = RunnableBranch((is_identifier_query, rag_chain), cached_chain)
+            rag_chain = cached_chain
+
+        if config.SINGLE_FLIGHT_ENABLED:
+            # Concurrent identical questions share one computation and its token stream
+            self.single_flight = SingleFlight()
+            rag_chain = SingleFlightChain(rag_chain, self.single_flight)
+
         logging.info("Chain created successfully.")
-        return rag_chain
\ No newline at end of file
+        return rag_chain
@@ -0,0 +1,166 @@
+# src/chunk_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+import config
+
+FORMAT_VERSION = 1
+
+
+def connect_read_only(path: Path) -> sqlite3.Connection:
+    """Opens a read-only SQLite connection that reads the file through a shared memory map.
+
+    Mapped pages live in the OS page cache, so processes serving the same store share them
+    instead of each filling a private SQLite page cache.
+    """
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_BYTES)}")
+    return conn
+
+
+class ChunkStore(Docstore):
+    """Read-only docstore that keeps chunks in an indexed SQLite file and reads them on demand.
+
+    Opening it only reads the header; page_content and metadata are fetched per query.
+    """
+
+    FILENAME = "chunks.sqlite"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.header = dict(self._connection().execute("SELECT key, value FROM header").fetchall())
+        if int(self.header.get("format_version", 0)) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store format in {self.path}. Please re-run `ingest.py`.")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns this thread's read-only connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_read_only(self.path)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Closes every thread's connection, e.g. when a replaced index snapshot is released."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def __len__(self) -> int:
+        return int(self.header["count"])
+
+    @staticmethod
+    def _to_document(row) -> Document:
+        doc_id, content, metadata = row
+        return Document(page_content=content, metadata=json.loads(metadata))
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._connection().execute(
+            "SELECT id, content, metadata FROM chunks WHERE id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._to_document(row)
+
+    def get_by_positions(self, positions: List[int]) -> Dict[int, Document]:
+        """Fetches the chunks stored at the given index positions in one query."""
+        if not positions:
+            return {}
+        placeholders = ",".join("?" * len(positions))
+        rows = self._connection().execute(
+            f"SELECT position, id, content, metadata FROM chunks WHERE position IN ({placeholders})",
+            [int(position) for position in positions],
+        ).fetchall()
+        return {row[0]: self._to_document(row[1:]) for row in rows}
+
+    def get_many(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetches the chunks with the given ids."""
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection().execute(
+                f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall()
+            found.update((row[0], self._to_document(row)) for row in rows)
+        return found
+
+    def iter_entries(self) -> Iterator[Tuple[int, str, Document]]:
+        """Yields (position, id, chunk) for every chunk in index order."""
+        cursor = self._connection().execute("SELECT position, id, content, metadata FROM chunks ORDER BY position")
+        for row in cursor:
+            yield row[0], row[1], self._to_document(row[1:])
+
+
+class PositionMap(Mapping):
+    """Lazy index position -> chunk id mapping backed by the chunk store."""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __getitem__(self, position: int) -> str:
+        row = self.store._connection().execute(
+            "SELECT id FROM chunks WHERE position = ?", (int(position),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self) -> Iterator[int]:
+        cursor = self.store._connection().execute("SELECT position FROM chunks ORDER BY position")
+        return (row[0] for row in cursor)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def write_chunk_store(path: Path, docstore: Docstore, index_to_docstore_id: Mapping,
+                      header: Optional[Dict[str, str]] = None):
+    """Writes all chunks of a vector store to a new chunk store file, replacing it atomically."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.execute("CREATE TABLE header (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        rows = []
+        for position, doc_id in sorted(index_to_docstore_id.items()):
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Chunk {doc_id} at position {position} is missing from the docstore.")
+            rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, default=str)))
+            if len(rows) >= 1000:
+                conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+
+        values = {"format_version": str(FORMAT_VERSION), "count": str(len(index_to_docstore_id))}
+        values.update(header or {})
+        conn.executemany("INSERT INTO header VALUES (?, ?)", list(values.items()))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logging.info(f"Chunk store written with {len(index_to_docstore_id)} chunks.")
@@ -0,0 +1,143 @@
+# src/context_packer.py
+import logging
+import re
+import threading
+import time
+from typing import List, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.batch_embedder import load_encoding
+from src.metrics import observe_stage
+import config
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 2) -> Set[Tuple[str, ...]]:
+    """Word n-grams of a text, ignoring case, punctuation and table layout."""
+    words = WORD_PATTERN.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def overlap_length(first: str, second: str, min_chars: int, max_chars: int) -> int:
+    """Length of the longest suffix of first that is a prefix of second (0 if shorter than min_chars)."""
+    for length in range(min(len(first), len(second), max_chars), min_chars - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+class ContextPacker:
+    """Turns retrieved chunks into prompt context without repeated text, within a token budget.
+
+    Chunks of the same page that overlap (CHUNK_OVERLAP) are merged, near-duplicates such as a
+    Camelot table and the page text it came from are dropped, and the remaining blocks are added
+    in relevance order until the budget is used up.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = config.CONTEXT_TOKEN_BUDGET,
+        duplicate_threshold: float = config.CONTEXT_DUPLICATE_THRESHOLD,
+        min_overlap_chars: int = config.CONTEXT_MIN_OVERLAP_CHARS,
+    ):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap_chars = min_overlap_chars
+        self.encoding = load_encoding(config.CHAT_MODEL)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text))
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        if self.encoding is None:
+            return text[:tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text)[:tokens])
+
+    def _merge_overlaps(self, docs: List[Document]) -> List[Document]:
+        """Joins chunks of the same page whose text overlaps, keeping the better-ranked position."""
+        merged = [Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in docs]
+        changed = True
+        while changed:
+            changed = False
+            for i, first in enumerate(merged):
+                for j, second in enumerate(merged):
+                    if i == j or first.metadata.get("page") != second.metadata.get("page") \
+                            or first.metadata.get("source") != second.metadata.get("source"):
+                        continue
+                    if second.page_content in first.page_content:
+                        content = first.page_content
+                    else:
+                        length = overlap_length(
+                            first.page_content, second.page_content, self.min_overlap_chars, 2 * config.CHUNK_OVERLAP
+                        )
+                        if not length:
+                            continue
+                        content = first.page_content + second.page_content[length:]
+                    keep, drop = min(i, j), max(i, j)
+                    merged[keep] = Document(page_content=content, metadata=merged[keep].metadata)
+                    del merged[drop]
+                    changed = True
+                    break
+                if changed:
+                    break
+        return merged
+
+    def _drop_duplicates(self, docs: List[Document]) -> List[Document]:
+        """Drops chunks whose text is mostly contained in a better-ranked chunk."""
+        kept: List[Tuple[Document, Set[Tuple[str, ...]]]] = []
+        for doc in docs:
+            doc_shingles = shingles(doc.page_content)
+            duplicate = any(
+                len(doc_shingles & other) / max(1, len(doc_shingles)) >= self.duplicate_threshold
+                for _, other in kept
+            )
+            if not duplicate:
+                kept.append((doc, doc_shingles))
+        return [doc for doc, _ in kept]
+
+    def pack(self, docs: List[Document]) -> str:
+        """Returns the context string for docs given in relevance order."""
+        start = time.perf_counter()
+        raw_tokens = self.count_tokens("\n\n".join(doc.page_content for doc in docs))
+        blocks = []
+        remaining = self.token_budget
+        for doc in self._drop_duplicates(self._merge_overlaps(docs)):
+            tokens = self.count_tokens(doc.page_content)
+            if tokens <= remaining:
+                blocks.append(doc.page_content)
+                remaining -= tokens
+            elif remaining >= 50:
+                # A truncated block is still better than leaving the budget unused
+                blocks.append(self._truncate(doc.page_content, remaining))
+                remaining = 0
+            if remaining <= 0:
+                break
+        context = "\n\n".join(blocks)
+
+        packed_tokens = self.count_tokens(context)
+        observe_stage("prompt_build", time.perf_counter() - start)
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += raw_tokens
+            self.tokens_out += packed_tokens
+        logging.info(
+            f"Context packed: {len(docs)} chunks -> {len(blocks)} blocks, {raw_tokens} -> {packed_tokens} tokens "
+            f"({raw_tokens - packed_tokens} saved)."
+        )
+        return context
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+        }
@@ -0,0 +1,428 @@
+# src/corpus.py
+"""
+Multi-document corpus: one index shard per regulation PDF plus a metadata catalogue.
+
+Layout under CORPUS_INDEX_PATH:
+    shards/<document id>/          a vector store per document, versioned like any store (src.snapshots)
+    snapshots/<name>/catalogue.json  which shard snapshot serves each document, with its metadata
+    CURRENT                        the published catalogue
+
+Publishing a catalogue switches every shard at once, so adding or changing one document only
+builds that document's shard. At query time the shards are combined behind the interfaces of a
+single store (a FAISS index, a chunk docstore, a BM25 index), so the retrievers work unchanged.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.additive_index import AdditiveLookup
+from src.chunk_store import ChunkStore
+from src.lexical_index import LexicalIndex
+from src.snapshots import (
+    current_snapshot, lease_snapshot, list_snapshots, new_snapshot, publish_snapshot, snapshot_path, store_root
+)
+from src.vector_index import load_vector_store
+import config
+
+CATALOGUE_FILE = "catalogue.json"
+SHARDS_DIR = "shards"
+# Optional file in the corpus directory: {"<file name>": {"title": ..., "date": "YYYY-MM-DD"}}
+METADATA_FILE = "metadata.json"
+
+DAY_FIRST_DATE = re.compile(r"(?<!\d)(\d{1,2})[_.-](\d{1,2})[_.-](\d{4})(?!\d)")
+YEAR_FIRST_DATE = re.compile(r"(?<!\d)(\d{4})[_.-](\d{1,2})[_.-](\d{1,2})(?!\d)")
+
+
+def is_corpus(path: Path) -> bool:
+    """Returns True if the directory holds a corpus catalogue rather than a single vector store."""
+    return (Path(path) / CATALOGUE_FILE).exists()
+
+
+def shard_root(root: Path, document_id: str) -> Path:
+    """Returns the store root of one document's shard."""
+    return Path(root) / SHARDS_DIR / document_id
+
+
+def document_id(pdf_path: Path) -> str:
+    """Derives a stable id from the file name, e.g. "compendium_food_additives_regulations_20_12_2022"."""
+    return re.sub(r"[^a-z0-9]+", "_", Path(pdf_path).stem.lower()).strip("_")
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _date_from_name(name: str) -> Optional[str]:
+    for pattern, order in ((YEAR_FIRST_DATE, (0, 1, 2)), (DAY_FIRST_DATE, (2, 1, 0))):
+        for match in pattern.finditer(name):
+            parts = [int(part) for part in match.groups()]
+            try:
+                return date(parts[order[0]], parts[order[1]], parts[order[2]]).isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def describe_document(pdf_path: Path, overrides: Optional[dict] = None) -> dict:
+    """Returns the catalogue metadata of a PDF: id, title, file, content hash, page count and date.
+
+    The date comes from the overrides, the file name (e.g. "..._20_12_2022.pdf") or the PDF's
+    creation date, in that order.
+    """
+    import fitz  # PyMuPDF; only needed when ingesting
+
+    pdf_path = Path(pdf_path)
+    overrides = overrides or {}
+    with fitz.open(str(pdf_path)) as pdf:
+        metadata = pdf.metadata or {}
+        pages = pdf.page_count
+    created = re.match(r"D:(\d{4})(\d{2})(\d{2})", metadata.get("creationDate") or "")
+    return {
+        "id": document_id(pdf_path),
+        "title": overrides.get("title") or metadata.get("title") or pdf_path.stem.replace("_", " "),
+        "file": str(pdf_path),
+        "sha256": file_hash(pdf_path),
+        "date": overrides.get("date") or _date_from_name(pdf_path.stem)
+        or (_date_from_name("-".join(created.groups())) if created else None),
+        "pages": pages,
+    }
+
+
+def scan_corpus(corpus_dir: Path) -> Dict[str, dict]:
+    """Describes every PDF in the corpus directory, keyed by document id."""
+    corpus_dir = Path(corpus_dir)
+    overrides = {}
+    if (corpus_dir / METADATA_FILE).exists():
+        with open(corpus_dir / METADATA_FILE, encoding="utf-8") as f:
+            overrides = json.load(f)
+    documents = {}
+    for pdf_path in sorted(corpus_dir.glob("*.pdf")):
+        entry = describe_document(pdf_path, overrides.get(pdf_path.name))
+        if entry["id"] in documents:
+            raise ValueError(f"{pdf_path.name} and {Path(documents[entry['id']]['file']).name} map to the same id.")
+        documents[entry["id"]] = entry
+    return documents
+
+
+class Catalogue:
+    """The documents of a corpus and the shard snapshot that serves each one."""
+
+    def __init__(self, documents: Optional[Dict[str, dict]] = None):
+        # document id -> {"id", "title", "file", "sha256", "date", "pages", "chunks", "snapshot", "indexed_at"}
+        self.documents = documents or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Catalogue":
+        with open(Path(path) / CATALOGUE_FILE, encoding="utf-8") as f:
+            return cls(json.load(f)["documents"])
+
+    @classmethod
+    def load_current(cls, root: Path) -> Optional["Catalogue"]:
+        """Loads the published catalogue of a corpus index, if there is one."""
+        path = snapshot_path(root, current_snapshot(root))
+        return cls.load(path) if is_corpus(path) else None
+
+    def save(self, path: Path):
+        with open(Path(path) / CATALOGUE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"documents": dict(sorted(self.documents.items()))}, f, indent=2)
+        logging.info(f"Corpus catalogue saved with {len(self.documents)} documents.")
+
+    def shard_path(self, root: Path, document: str) -> Path:
+        return snapshot_path(shard_root(root, document), self.documents[document]["snapshot"])
+
+    def select(
+        self, documents: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None
+    ) -> List[str]:
+        """Returns the ids of the documents matching all given filters.
+
+        documents are ids or file names; since/until are inclusive ISO dates, and documents
+        without a known date never match a date filter.
+        """
+        selected = sorted(self.documents)
+        if documents:
+            by_name = {Path(entry["file"]).name: document for document, entry in self.documents.items()}
+            wanted = {by_name.get(name, name) for name in documents}
+            unknown = sorted(wanted - set(self.documents))
+            if unknown:
+                raise ValueError(f"Unknown documents: {', '.join(unknown)}")
+            selected = [document for document in selected if document in wanted]
+        if since or until:
+            for bound in filter(None, (since, until)):
+                date.fromisoformat(bound)
+            selected = [
+                document for document in selected
+                if self.documents[document].get("date")
+                and (not since or self.documents[document]["date"] >= since)
+                and (not until or self.documents[document]["date"] <= until)
+            ]
+        if not selected:
+            raise ValueError("No documents match the filter.")
+        return selected
+
+
+def prune_shards(root: Path):
+    """Deletes the shards of documents that no retained catalogue snapshot refers to any more."""
+    referenced = set()
+    for name in list_snapshots(root):
+        path = snapshot_path(root, name)
+        if is_corpus(path):
+            referenced.update(Catalogue.load(path).documents)
+    shards = Path(root) / SHARDS_DIR
+    if not shards.exists():
+        return
+    for entry in shards.iterdir():
+        if entry.is_dir() and entry.name not in referenced:
+            shutil.rmtree(entry, ignore_errors=True)
+            logging.info(f"Removed the shard of document {entry.name}, which left the corpus.")
+
+
+def _locate(offsets: List[int], position: int) -> int:
+    """Returns the shard holding a global index position, given each shard's first position."""
+    return bisect.bisect_right(offsets, position) - 1
+
+
+class ShardedChunkStore(Docstore):
+    """Chunk docstore over several shards; global positions follow the shards' order in the index."""
+
+    def __init__(self, shards: List[Tuple[str, ChunkStore]]):
+        self.shards = shards
+        self.offsets = []
+        total = 0
+        for _, store in shards:
+            self.offsets.append(total)
+            total += len(store)
+        self.count = total
+
+    def __len__(self) -> int:
+        return self.count
+
+    def search(self, search: str) -> Union[str, Document]:
+        # Chunk ids are only unique within a document, so sharded ids are "<document>/<chunk id>"
+        document, _, chunk_id = search.partition("/")
+        for name, store in self.shards:
+            if name == document:
+                return store.search(chunk_id)
+        return f"ID {search} not found."
+
+    def get_by_positions(self, positions: List[int]) -> Dict[int, Document]:
+        """Fetches chunks by global index position, tagging each with the document it came from."""
+        by_shard: Dict[int, List[int]] = {}
+        for position in positions:
+            by_shard.setdefault(_locate(self.offsets, position), []).append(position)
+        found = {}
+        for shard, shard_positions in by_shard.items():
+            name, store = self.shards[shard]
+            offset = self.offsets[shard]
+            for local, doc in store.get_by_positions([position - offset for position in shard_positions]).items():
+                doc.metadata["document"] = name
+                found[local + offset] = doc
+        return found
+
+    def close(self):
+        for _, store in self.shards:
+            store.close()
+
+
+class ShardedPositionMap(Mapping):
+    """Global index position -> "<document>/<chunk id>", resolved in the owning shard."""
+
+    def __init__(self, store: ShardedChunkStore):
+        self.store = store
+
+    def __getitem__(self, position: int) -> str:
+        shard = _locate(self.store.offsets, position)
+        if shard < 0 or position >= len(self.store):
+            raise KeyError(position)
+        name, chunks = self.store.shards[shard]
+        row = chunks._connection().execute(
+            "SELECT id FROM chunks WHERE position = ?", (int(position) - self.store.offsets[shard],)
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return f"{name}/{row[0]}"
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.store)))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class ShardedLexicalIndex:
+    """BM25 over several shards, searched concurrently and merged by score.
+
+    Each shard scores with its own term statistics, so scores are comparable across documents
+    of similar size and style, which holds for regulation PDFs.
+    """
+
+    def __init__(self, shards: List[Tuple[int, LexicalIndex]], executor: ThreadPoolExecutor):
+        # (first global position of the shard, its BM25 index)
+        self.shards = shards
+        self.executor = executor
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (global index position, BM25 score) pairs, best first."""
+        def search_shard(shard: Tuple[int, LexicalIndex]) -> List[Tuple[int, float]]:
+            offset, index = shard
+            return [(offset + position, score) for position, score in index.search(query, k)]
+
+        results = self.executor.map(search_shard, self.shards)
+        return heapq.nlargest(k, (hit for hits in results for hit in hits), key=lambda hit: hit[1])
+
+    def close(self):
+        for _, index in self.shards:
+            index.close()
+
+
+class ShardedAdditiveLookup:
+    """Additive table lookups over every shard that has an additive index."""
+
+    def __init__(self, lookups: List[AdditiveLookup]):
+        self.lookups = lookups
+
+    def find(self, question: str) -> List[dict]:
+        return [row for lookup in self.lookups for row in lookup.find(question)]
+
+    def context_for(self, question: str) -> str:
+        return "\n\n".join(filter(None, (lookup.context_for(question) for lookup in self.lookups)))
+
+    def direct_answer(self, question: str) -> Optional[str]:
+        for lookup in self.lookups:
+            answer = lookup.direct_answer(question)
+            if answer is not None:
+                return answer
+        return None
+
+    def close(self):
+        for lookup in self.lookups:
+            lookup.close()
+
+
+class _Shard:
+    def __init__(self, entry: dict, vector_store: FAISS, lexical: Optional[LexicalIndex],
+                 lookup: Optional[AdditiveLookup]):
+        self.entry = entry
+        self.vector_store = vector_store
+        self.lexical = lexical
+        self.lookup = lookup
+        self.lease = None
+
+
+class CorpusView:
+    """A set of shards presented as one vector store, BM25 index and additive lookup."""
+
+    def __init__(self, shards: List[_Shard], embedding_model, executor: ThreadPoolExecutor):
+        self.documents = [shard.entry["id"] for shard in shards]
+        # IndexShards searches every shard in its own thread and merges the top k by distance;
+        # successive ids offset each shard's positions by the sizes of the shards before it
+        index = faiss.IndexShards(shards[0].vector_store.index.d, True, True)
+        for shard in shards:
+            index.add_shard(shard.vector_store.index)
+        docstore = ShardedChunkStore([(shard.entry["id"], shard.vector_store.docstore) for shard in shards])
+        self.vector_store = FAISS(embedding_model, index, docstore, ShardedPositionMap(docstore))
+        lexical = [(offset, shard.lexical) for offset, shard in zip(docstore.offsets, shards)
+                   if shard.lexical is not None]
+        self.lexical = ShardedLexicalIndex(lexical, executor) if lexical else None
+        lookups = [shard.lookup for shard in shards if shard.lookup is not None]
+        self.additive_lookup = ShardedAdditiveLookup(lookups) if lookups else None
+        # The sub-indexes belong to the shards; IndexShards only refers to them
+        self._shards = shards
+
+
+class CorpusStore:
+    """Opens every shard of a published catalogue and hands out views over subsets of them."""
+
+    def __init__(self, path: Path, embedding_model, workers: int = config.CORPUS_QUERY_WORKERS):
+        self.path = Path(path)
+        self.version = self.path.name
+        self.catalogue = Catalogue.load(self.path)
+        if not self.catalogue.documents:
+            raise FileNotFoundError(f"The corpus catalogue in {self.path} lists no documents.")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="corpus")
+        root = store_root(self.path)
+        start = time.perf_counter()
+        entries = [self.catalogue.documents[document] for document in sorted(self.catalogue.documents)]
+        # Shards load concurrently; FAISS reads and SQLite opens release the GIL
+        self.shards = list(self.executor.map(lambda entry: self._open_shard(root, entry, embedding_model), entries))
+        self.embedding_model = embedding_model
+        self._views: "OrderedDict[Tuple[str, ...], CorpusView]" = OrderedDict()
+        self._views_lock = threading.Lock()
+        self.view = self.subset(self.catalogue.documents)
+        logging.info(
+            f"Loaded a corpus of {len(self.shards)} documents ({len(self.view.vector_store.docstore)} chunks) "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+
+    def _open_shard(self, root: Path, entry: dict, embedding_model) -> _Shard:
+        path = self.catalogue.shard_path(root, entry["id"])
+        # A re-indexed document prunes its shard's old snapshots, which must skip this one
+        lease = lease_snapshot(path)
+        shard = _Shard(
+            entry,
+            load_vector_store(path, embedding_model),
+            LexicalIndex.open(path) if config.HYBRID_RETRIEVAL_ENABLED else None,
+            AdditiveLookup.open(path) if config.ADDITIVE_LOOKUP_ENABLED else None,
+        )
+        shard.lease = lease
+        return shard
+
+    def subset(self, documents) -> CorpusView:
+        """Returns the view over the given document ids.
+
+        The CORPUS_VIEW_CACHE_SIZE most recently used views are kept; concurrent requests for the
+        same new subset build it once.
+        """
+        key = tuple(sorted(documents))
+        with self._views_lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+            view = CorpusView([shard for shard in self.shards if shard.entry["id"] in key],
+                              self.embedding_model, self.executor)
+            self._views[key] = view
+            if len(self._views) > config.CORPUS_VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+    def select(
+        self, documents: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None
+    ) -> CorpusView:
+        """Returns the view over the documents matching the filters (see Catalogue.select)."""
+        return self.subset(self.catalogue.select(documents, since, until))
+
+    def close(self):
+        for shard in self.shards:
+            for resource in (shard.vector_store.docstore, shard.lexical, shard.lookup, shard.lease):
+                if resource is not None:
+                    resource.close()
+        self.executor.shutdown(wait=False)
+
+
+def publish_catalogue(root: Path, catalogue: Catalogue, keep: int = config.SNAPSHOT_KEEP):
+    """Writes the catalogue into a new snapshot of the corpus index and publishes it."""
+    path = new_snapshot(root)
+    catalogue.save(path)
+    publish_snapshot(root, path, keep)
+    prune_shards(root)
@@ -0,0 +1,177 @@
+# src/deduplicator.py
+import logging
+import re
+import threading
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from langchain_core.documents import Document
+
+import config
+
+WORD_PATTERN = re.compile(r"\w+")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_PRIME = (1 << 31) - 1
+
+
+def furniture_key(line: str) -> str:
+    """Normalizes a line so 'Page 12 of 300' and 'Page 13 of 300' compare equal."""
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def is_content_key(key: str) -> bool:
+    """True for keys of lines with no words, e.g. a bare page number, an INS code or a limit.
+
+    Those repeat on many pages as table cells, so they are never treated as furniture.
+    """
+    return not re.search(r"[a-z]", key)
+
+
+def detect_page_furniture(
+    pdf_path: Path,
+    min_fraction: float = config.PAGE_FURNITURE_MIN_FRACTION,
+    edge_lines: int = config.PAGE_FURNITURE_EDGE_LINES,
+) -> Set[str]:
+    """Finds header/footer lines that repeat at the top or bottom of many pages."""
+    counts = Counter()
+    with fitz.open(str(pdf_path)) as pdf:
+        page_count = pdf.page_count
+        for page in pdf:
+            lines = [line for line in page.get_text("text").splitlines() if line.strip()]
+            edges = lines[:edge_lines] + lines[-edge_lines:]
+            counts.update({key for key in map(furniture_key, edges) if not is_content_key(key)})
+    min_pages = max(3, int(page_count * min_fraction))
+    furniture = {key for key, count in counts.items() if count >= min_pages}
+    logging.info(f"Detected {len(furniture)} recurring header/footer lines across {page_count} pages.")
+    return furniture
+
+
+def strip_furniture(text: str, furniture: Set[str], edge_lines: int = config.PAGE_FURNITURE_EDGE_LINES) -> str:
+    """Removes furniture lines from the top and bottom edge_lines (non-blank) lines of a page's text."""
+    if not furniture:
+        return text
+    lines = text.splitlines()
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    edges = set(filled[:edge_lines] + filled[max(0, len(filled) - edge_lines):])
+    return "\n".join(
+        line for i, line in enumerate(lines)
+        if i not in edges or is_content_key(furniture_key(line)) or furniture_key(line) not in furniture
+    )
+
+
+def numeric_tokens(text: str) -> Tuple[str, ...]:
+    """The numbers of a text in order; chunks that differ in any of them (e.g. a limit) are never duplicates."""
+    return tuple(NUMBER_PATTERN.findall(text))
+
+
+def shingles(text: str, size: int) -> Set[str]:
+    """Word n-grams of a text, ignoring case, punctuation and whitespace layout."""
+    words = WORD_PATTERN.findall(text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+class ChunkDeduplicator:
+    """Drops near-duplicate chunks before they are embedded.
+
+    Chunks are compared by MinHash signatures of word 3-gram shingles, with LSH banding to find
+    candidates, so every chunk is only checked against a handful of earlier ones. Only chunks
+    with exactly the same numbers are dropped as near duplicates, and table chunks never are.
+    Text chunks that repeat a table already extracted from the same page are dropped as well.
+
+    duplicates records, per page, each chunk dropped as a duplicate of a chunk on another page
+    and that page, so incremental ingestion can re-check it when the other page changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = config.DEDUP_SIMILARITY_THRESHOLD,
+        table_containment: float = config.DEDUP_TABLE_CONTAINMENT,
+        num_perm: int = config.DEDUP_NUM_PERM,
+        bands: int = config.DEDUP_BANDS,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS.")
+        self.threshold = threshold
+        self.table_containment = table_containment
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        # (numeric tokens, page) of each registered signature
+        self._entries: List[Tuple[Tuple[str, ...], Optional[int]]] = []
+        self.duplicates: Dict[int, Dict[str, int]] = defaultdict(dict)
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.near_duplicates = 0
+        self.table_duplicates = 0
+        self.chars_saved = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles(text, 3)], dtype=np.uint64
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _near_duplicate_of(self, signature: np.ndarray, numbers: Tuple[str, ...], page: Optional[int]):
+        """Returns the entry (numbers, page) a chunk duplicates, or registers the chunk and returns None."""
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {index for band, key in enumerate(keys) for index in self._buckets[band].get(key, ())}
+        for index in sorted(candidates):
+            if self._entries[index][0] == numbers and np.mean(self._signatures[index] == signature) >= self.threshold:
+                return self._entries[index]
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._entries.append((numbers, page))
+        for band, key in enumerate(keys):
+            self._buckets[band][key].append(position)
+        return None
+
+    def filter(self, chunks: List[Document], ids: List[str]) -> Tuple[List[Document], List[str]]:
+        """Returns the chunks (and ids) of one page that are not duplicates of earlier ones."""
+        table_shingles = set()
+        for chunk in chunks:
+            if chunk.metadata.get("type") == "table":
+                table_shingles |= shingles(chunk.page_content, 2)
+
+        kept_chunks, kept_ids = [], []
+        with self._lock:
+            for chunk, chunk_id in zip(chunks, ids):
+                self.seen += 1
+                if table_shingles and chunk.metadata.get("type") != "table":
+                    own = shingles(chunk.page_content, 2)
+                    if len(own & table_shingles) / len(own) >= self.table_containment:
+                        self.table_duplicates += 1
+                        self.chars_saved += len(chunk.page_content)
+                        continue
+                if chunk.metadata.get("type") != "table":
+                    page = chunk.metadata.get("page")
+                    text = chunk.page_content
+                    original = self._near_duplicate_of(self.signature(text), numeric_tokens(text), page)
+                    if original is not None:
+                        self.near_duplicates += 1
+                        self.chars_saved += len(text)
+                        if original[1] is not None and original[1] != page:
+                            self.duplicates[page][chunk_id] = original[1]
+                        continue
+                kept_chunks.append(chunk)
+                kept_ids.append(chunk_id)
+        return kept_chunks, kept_ids
+
+    def stats(self) -> dict:
+        dropped = self.near_duplicates + self.table_duplicates
+        return {
+            "chunks_seen": self.seen,
+            "near_duplicates": self.near_duplicates,
+            "table_duplicates": self.table_duplicates,
+            "vectors_saved": dropped,
+            "embedding_inputs_saved": dropped,
+            "embedding_tokens_saved": self.chars_saved // 4,  # ~4 characters per token
+        }
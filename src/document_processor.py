@@ -1,62 +1,217 @@
 # src/document_processor.py
+import hashlib
 import logging
-from typing import List
-import camelot
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import fitz  # PyMuPDF
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, TABLE_EXTRACTION_WORKERS, TABLE_SHARD_SIZE, TABLE_DETECTION_ENABLED,
+    STRIP_PAGE_FURNITURE
+)
+from src.deduplicator import detect_page_furniture, strip_furniture
+from src.metrics import observe_stage, span
+from src.table_detector import TablePageClassifier
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _run_shard(pdf_path: str, pages: List[int]) -> Tuple[List[Tuple[int, str, List[List[str]]]], Optional[str], float]:
+    """Runs Camelot over one shard of pages; returns ([(page, table text, table rows)], error message, seconds)."""
+    # Timed here because the worker process's own metrics never reach the parent
+    start = time.perf_counter()
+    try:
+        # Imported here so Camelot and its OpenCV stack load only in table extraction workers
+        import camelot
+        page_spec = ",".join(str(page) for page in pages)
+        tables = camelot.read_pdf(pdf_path, pages=page_spec, flavor="stream", suppress_stdout=True)
+        return [
+            (int(table.page), table.df.to_string(index=False, header=True), table.df.values.tolist())
+            for table in tables
+        ], None, time.perf_counter() - start
+    except Exception as e:
+        return [], str(e), time.perf_counter() - start
+
+def _shard_outcome(future) -> Tuple[List[Tuple[int, str, List[List[str]]]], Optional[str], float]:
+    """Returns a shard's result, turning a crashed worker into a per-shard error."""
+    try:
+        return future.result()
+    except Exception as e:
+        return [], str(e), 0.0
+
 class DocumentProcessor:
     """Handles loading, parsing, and chunking of documents."""
 
-    def __init__(self, pdf_path: str):
+    def __init__(
+        self,
+        pdf_path: str,
+        table_classifier: Optional[TablePageClassifier] = None,
+        table_sink: Optional[Callable[[int, List[List[str]]], None]] = None,
+        table_workers: int = TABLE_EXTRACTION_WORKERS,
+    ):
         self.pdf_path = pdf_path
+        # Camelot processes; documents indexed in parallel split TABLE_EXTRACTION_WORKERS between them
+        self.table_workers = table_workers
+        self.table_classifier = table_classifier or TablePageClassifier()
+        # Receives (page, rows) of every extracted table, e.g. to build the additive lookup index
+        self.table_sink = table_sink
+        self._furniture: Optional[Set[str]] = None
 
-    def _extract_tables(self) -> List[Document]:
-        """Extracts tables from the PDF using Camelot."""
-        logging.info("Extracting tables from PDF...")
-        try:
-            tables = camelot.read_pdf(str(self.pdf_path), pages="all", flavor="stream", suppress_stdout=True)
-            table_docs = [
+    def page_hashes(self) -> Dict[int, str]:
+        """Returns a content hash of every page, keyed by 1-based page number."""
+        with fitz.open(str(self.pdf_path)) as pdf:
+            return {
+                number: hashlib.sha256(page.get_text("text").encode("utf-8")).hexdigest()
+                for number, page in enumerate(pdf, start=1)
+            }
+
+    def _page_shards(self, pages: Optional[List[int]]) -> List[List[int]]:
+        """Splits the pages to scan into shards of TABLE_SHARD_SIZE pages."""
+        if TABLE_DETECTION_ENABLED:
+            # Only pages that look tabular are worth a Camelot pass
+            pages = self.table_classifier.candidate_pages(self.pdf_path, pages)
+        elif pages is None:
+            with fitz.open(str(self.pdf_path)) as pdf:
+                pages = list(range(1, pdf.page_count + 1))
+        pages = sorted(pages)
+        return [pages[i:i + TABLE_SHARD_SIZE] for i in range(0, len(pages), TABLE_SHARD_SIZE)]
+
+    def _iter_table_shards(self, shards: List[List[int]]) -> Iterator[Tuple[List[int], List[Document]]]:
+        """Runs Camelot over shards in a process pool and yields their tables in page order.
+
+        At most two shards per worker are in flight, so results never pile up in memory.
+        """
+        workers = max(1, min(self.table_workers, len(shards)))
+        failed_shards = 0
+        table_count = 0
+
+        def to_documents(shard, outcome):
+            nonlocal failed_shards, table_count
+            tables, error, seconds = outcome
+            observe_stage("table_extraction", seconds)
+            if error is not None:
+                # A broken shard only loses its own pages
+                failed_shards += 1
+                logging.error(f"Error extracting tables from pages {shard[0]}-{shard[-1]}: {error}")
+            table_count += len(tables)
+            if self.table_sink is not None:
+                for page, _, rows in tables:
+                    self.table_sink(page, rows)
+            return [
                 Document(
-                    page_content=table.df.to_string(index=False, header=True),
-                    metadata={"source": f"table_page_{i}"}
+                    page_content=text,
+                    metadata={"source": str(self.pdf_path), "page": page, "type": "table"}
                 )
-                for i, table in enumerate(tables)
+                for page, text, _ in tables
             ]
-            logging.info(f"Successfully extracted {len(table_docs)} tables.")
-            return table_docs
+
+        if workers == 1:
+            for shard in shards:
+                yield shard, to_documents(shard, _run_shard(str(self.pdf_path), shard))
+        else:
+            # Spawned, not forked: this runs on pipeline threads while embedder threads and HTTP pools
+            # hold locks that a forked child would inherit in a locked state
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                remaining = iter(shards)
+                pending = deque(
+                    (shard, pool.submit(_run_shard, str(self.pdf_path), shard))
+                    for shard in islice(remaining, workers * 2)
+                )
+                while pending:
+                    shard, future = pending.popleft()
+                    outcome = _shard_outcome(future)
+                    next_shard = next(remaining, None)
+                    if next_shard is not None:
+                        pending.append((next_shard, pool.submit(_run_shard, str(self.pdf_path), next_shard)))
+                    yield shard, to_documents(shard, outcome)
+
+        logging.info(
+            f"Successfully extracted {table_count} tables from {len(shards)} page shards "
+            f"using {workers} workers ({failed_shards} shards failed)."
+        )
+
+    def _extract_tables(self, pages: Optional[List[int]] = None) -> List[Document]:
+        """Extracts tables from the PDF using Camelot, sharding pages across a process pool."""
+        logging.info("Extracting tables from PDF...")
+        try:
+            shards = self._page_shards(pages)
         except Exception as e:
-            logging.error(f"Error extracting tables: {e}")
+            logging.error(f"Error reading page count for table extraction: {e}")
             return []
+        return [doc for _, table_docs in self._iter_table_shards(shards) for doc in table_docs]
+
+    def page_furniture(self) -> Set[str]:
+        """Returns the recurring header/footer lines of the whole document (computed once)."""
+        if self._furniture is None:
+            self._furniture = detect_page_furniture(self.pdf_path) if STRIP_PAGE_FURNITURE else set()
+        return self._furniture
+
+    def _text_document(self, pdf, number: int) -> Document:
+        """Builds the text Document of one 1-based page of an open PDF, without headers and footers."""
+        furniture = self.page_furniture()
+        with span("text_extraction"):
+            return Document(
+                page_content=strip_furniture(pdf[number - 1].get_text("text"), furniture),
+                metadata={"source": str(self.pdf_path), "page": number, "type": "text"}
+            )
+
+    def iter_page_documents(self, pages: Optional[List[int]] = None) -> Iterator[Tuple[int, List[Document]]]:
+        """Yields (page number, [table docs..., text doc]) page by page, in page order.
+
+        Camelot keeps working on upcoming shards while earlier pages are consumed.
+        """
+        with fitz.open(str(self.pdf_path)) as pdf:
+            page_numbers = sorted(pages) if pages is not None else list(range(1, pdf.page_count + 1))
+            shards = self._page_shards(page_numbers)
+            position = 0
+            tables_by_page = defaultdict(list)
+            for shard, table_docs in self._iter_table_shards(shards):
+                for doc in table_docs:
+                    tables_by_page[doc.metadata["page"]].append(doc)
+                # Every page up to the end of this shard now has all of its tables
+                while position < len(page_numbers) and page_numbers[position] <= shard[-1]:
+                    number = page_numbers[position]
+                    yield number, tables_by_page.pop(number, []) + [self._text_document(pdf, number)]
+                    position += 1
+            for number in page_numbers[position:]:
+                yield number, tables_by_page.pop(number, []) + [self._text_document(pdf, number)]
 
-    def _extract_text(self) -> List[Document]:
-        """Extracts text from the PDF using PyMuPDF."""
+    def _extract_text(self, pages: Optional[List[int]] = None) -> List[Document]:
+        """Extracts text from the PDF using PyMuPDF, optionally limited to some pages."""
         logging.info("Extracting text from PDF...")
         try:
-            loader = PyMuPDFLoader(str(self.pdf_path))
-            text_docs = loader.load()
+            with fitz.open(str(self.pdf_path)) as pdf:
+                page_numbers = pages if pages is not None else range(1, pdf.page_count + 1)
+                text_docs = [self._text_document(pdf, number) for number in page_numbers]
             logging.info(f"Successfully extracted {len(text_docs)} pages of text.")
             return text_docs
         except Exception as e:
             logging.error(f"Error extracting text: {e}")
             return []
 
-    def load_and_chunk(self) -> List[Document]:
-        """Loads all documents, combines them, and splits into chunks."""
+    def load_and_chunk(self, pages: Optional[List[int]] = None) -> List[Document]:
+        """Loads all documents (or only the given pages), combines them, and splits into chunks."""
         logging.info("Starting document loading and chunking process...")
-        table_docs = self._extract_tables()
-        text_docs = self._extract_text()
+        if pages is not None and not pages:
+            return []
+        table_docs = self._extract_tables(pages)
+        text_docs = self._extract_text(pages)
         all_docs = table_docs + text_docs
 
         if not all_docs:
             logging.error("No documents were extracted. Aborting.")
             return []
-            
-        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        chunks = splitter.split_documents(all_docs)
+
+        chunks = self.split(all_docs)
         logging.info(f"Split documents into {len(chunks)} chunks.")
-        return chunks
\ No newline at end of file
+        return chunks
+
+    def split(self, docs: List[Document]) -> List[Document]:
+        """Splits documents into chunks of CHUNK_SIZE characters."""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        with span("chunking"):
+            return splitter.split_documents(docs)
@@ -0,0 +1,257 @@
+# src/embedding_cache.py
+import asyncio
+import functools
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from src.http_clients import get_async_http_client, get_http_client
+import config
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different copies of a text share a cache entry."""
+    return " ".join(text.split())
+
+
+# Buffered last_used updates are written once this many keys are pending, or after this long
+TOUCH_FLUSH_KEYS = 256
+TOUCH_FLUSH_SECONDS = 30.0
+# Eviction runs once the estimated size passes max_entries by this fraction, and trims back to max_entries
+EVICTION_SLACK = 0.1
+
+
+async def _in_thread(func, *args):
+    """Runs blocking SQLite work off the event loop (asyncio.to_thread needs Python 3.9)."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+class EmbeddingCache:
+    """On-disk embedding store keyed by (embedding model, normalized text hash).
+
+    Lookups stay read-only: hits buffer their last_used time in memory and write it in batches,
+    and the row count is tracked in memory so puts do not count the table (the LRU order is
+    therefore approximate, and the cap may be exceeded by EVICTION_SLACK between evictions).
+    """
+
+    def __init__(self, path: Path, model: str, max_entries: Optional[int] = None):
+        self.path = Path(path)
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.monotonic()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        # Estimated row count; other processes may write to the same file, so it is re-counted on eviction
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def key(self, text: str) -> str:
+        """Returns the content address of a text for this cache's model."""
+        payload = f"{self.model}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Looks up vectors for the given texts; missing entries are returned as None."""
+        keys = [self.key(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = list(set(keys[start:start + 500]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if (
+                    len(self._touched) >= TOUCH_FLUSH_KEYS
+                    or time.monotonic() - self._touched_since >= TOUCH_FLUSH_SECONDS
+                ):
+                    self._flush_touched()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Stores vectors for the given texts, evicting least recently used entries over the cap."""
+        now = time.time()
+        rows = [
+            (self.key(text), self.model, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+                # Replaced keys are counted too; the estimate is corrected when eviction re-counts
+                self._count += len(rows)
+                self._flush_touched()
+                self._evict()
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _flush_touched(self):
+        """Writes the buffered last_used times of cache hits (caller holds the lock)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_since = time.monotonic()
+
+    def _evict(self):
+        """Drops the least recently used entries once the cache grows past its high-water mark."""
+        if not self.max_entries or self._count <= self.max_entries * (1 + EVICTION_SLACK):
+            return
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self._count -= excess
+            logging.info(f"Evicted {excess} entries from the embedding cache.")
+
+    def flush(self):
+        """Writes the buffered last_used times of cache hits."""
+        with self._lock:
+            self._flush_touched()
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._touched.clear()
+            self._count = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an EmbeddingCache."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def _split_misses(self, texts: List[str]):
+        """Returns cached vectors plus one representative text per uncached key."""
+        vectors = self.cache.get_many(texts)
+        missing: Dict[str, str] = {}
+        for text, vector in zip(texts, vectors):
+            if vector is None:
+                missing.setdefault(self.cache.key(text), text)
+        return vectors, list(missing.values())
+
+    def _merge(self, texts, vectors, missing, embedded) -> List[List[float]]:
+        """Stores freshly embedded texts and fills them into the result."""
+        if missing:
+            self.cache.put_many(missing, embedded)
+            by_key = {self.cache.key(text): vector for text, vector in zip(missing, embedded)}
+            vectors = [
+                vector if vector is not None else by_key[self.cache.key(text)]
+                for text, vector in zip(texts, vectors)
+            ]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._split_misses(texts)
+        if missing:
+            logging.info(f"Embedding cache: {len(texts) - len(missing)} hits, embedding {len(missing)} new texts.")
+        embedded = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge(texts, vectors, missing, embedded)
+
+    def embed_query(self, text: str) -> List[float]:
+        (vector,) = self.cache.get_many([text])
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many([text], [vector])
+        return vector
+
+    # The async variants keep the cache's SQLite calls off the event loop
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = await _in_thread(self._split_misses, texts)
+        embedded = await self.embeddings.aembed_documents(missing) if missing else []
+        if not missing:
+            return vectors
+        return await _in_thread(self._merge, texts, vectors, missing, embedded)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        (vector,) = await _in_thread(self.cache.get_many, [text])
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await _in_thread(self.cache.put_many, [text], [vector])
+        return vector
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """Opens the shared on-disk embedding cache, or returns None when it is disabled."""
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    return EmbeddingCache(
+        config.EMBEDDING_CACHE_PATH,
+        model=config.EMBEDDING_MODEL,
+        max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+
+
+def create_embedding_model(cache: Optional[EmbeddingCache] = None) -> Embeddings:
+    """Builds the embedding model used by both ingestion and querying."""
+    # Shares the process-wide connection pools with the chat model
+    embedding_model = OpenAIEmbeddings(
+        model=config.EMBEDDING_MODEL,
+        base_url=config.OPENAI_BASE_URL,
+        # Queries are far below the input limit and ingestion truncates in BatchEmbedder, so texts are
+        # sent as-is instead of being tokenized locally (which also needs tiktoken's encoding download)
+        check_embedding_ctx_length=False,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+    cache = cache or create_embedding_cache()
+    if cache is None:
+        return embedding_model
+    return CachedEmbeddings(embedding_model, cache)
@@ -0,0 +1,182 @@
+# src/hot_swap.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from src.chain_manager import FssaiChainManager
+from src.snapshots import current_snapshot, default_store_root, snapshot_path
+from src.startup import startup_phase
+import config
+
+
+class _Generation:
+    """One loaded snapshot, the objects built on it, and the requests still using it."""
+
+    def __init__(self, version: Optional[str], manager: FssaiChainManager, value: Any):
+        self.version = version
+        self.manager = manager
+        self.value = value
+        self.active = 0
+        self.retired = False
+        self.loaded_at = time.time()
+
+
+class IndexHotSwapper:
+    """Keeps serving objects built on the published vector store snapshot, swapping in new ones live.
+
+    root defaults to the store the servers read (default_store_root); for a corpus index, every
+    published catalogue is a snapshot, so adding a document is picked up the same way.
+
+    A background thread polls the store's CURRENT pointer. A new snapshot is loaded, built on with
+    build(manager) and warmed with probe queries off the request path, then swapped in between
+    requests. Requests that started on the old snapshot finish on it; once the last one is done,
+    its files are closed and close_value (if given) releases whatever build() created.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        build: Callable[[FssaiChainManager], Any] = lambda manager: manager,
+        probes: List[str] = config.WARMUP_QUERIES,
+        close_value: Optional[Callable[[Any], None]] = None,
+        poll_seconds: float = config.SNAPSHOT_POLL_SECONDS,
+    ):
+        self.root = Path(root or default_store_root())
+        self.build = build
+        self.probes = probes
+        self.close_value = close_value
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._failed_version: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.swaps = 0
+        # The first snapshot loads on the caller's thread so startup fails loudly if it is broken
+        self._current = self._load(current_snapshot(self.root))
+
+    def _load(self, version: Optional[str]) -> _Generation:
+        start = time.perf_counter()
+        # Phases are only recorded for the first load, while the process is still starting up
+        with startup_phase("vector store load"):
+            manager = FssaiChainManager(snapshot_path(self.root, version))
+        try:
+            with startup_phase("chain build"):
+                generation = _Generation(version, manager, self.build(manager))
+            with startup_phase("warm-up"):
+                self._warm(generation)
+        except Exception:
+            manager.close()
+            raise
+        logging.info(f"Loaded index snapshot {version or '(unversioned)'} in {time.perf_counter() - start:.2f}s.")
+        return generation
+
+    def _warm(self, generation: _Generation):
+        """Runs the probe queries, which pages in the index and fails fast on a broken snapshot."""
+        retriever = generation.manager.create_retriever()
+        for probe in self.probes:
+            if not retriever.invoke(probe):
+                raise ValueError(f"Probe query {probe!r} returned no chunks")
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current.version
+
+    @contextmanager
+    def acquire(self):
+        """Yields the current value; the snapshot it was built on stays open until the block exits."""
+        with self._lock:
+            generation = self._current
+            generation.active += 1
+        try:
+            yield generation.value
+        finally:
+            with self._lock:
+                generation.active -= 1
+                release = generation.retired and generation.active == 0
+            if release:
+                self._release(generation)
+
+    def _release(self, generation: _Generation):
+        if self.close_value is not None:
+            self.close_value(generation.value)
+        generation.manager.close()
+        logging.info(f"Released index snapshot {generation.version or '(unversioned)'}.")
+
+    def check(self) -> bool:
+        """Swaps in a newly published snapshot; returns True if it did."""
+        version = current_snapshot(self.root)
+        if version == self._current.version or version == self._failed_version:
+            return False
+        try:
+            generation = self._load(version)
+        except Exception as e:
+            # Keep serving the old snapshot; a later publish is tried again
+            self._failed_version = version
+            logging.error(f"Index snapshot {version} failed to load or warm up; keeping the current one: {e}")
+            return False
+
+        with self._lock:
+            previous, self._current = self._current, generation
+            previous.retired = True
+            release = previous.active == 0
+            self.swaps += 1
+        logging.info(
+            f"Swapped index snapshot {previous.version or '(unversioned)'} -> {version} "
+            f"({previous.active} requests still finishing on the old one)."
+        )
+        if release:
+            self._release(previous)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Index snapshot watcher error: {e}")
+
+    def start(self):
+        """Starts polling for new snapshots in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "version": self._current.version,
+            "loaded_at": self._current.loaded_at,
+            "swaps": self.swaps,
+            "active_requests": self._current.active,
+        }
+
+
+class HotSwapChain(Runnable):
+    """Runs each question on the chain of the snapshot that was current when the question arrived."""
+
+    def __init__(self, swapper: IndexHotSwapper):
+        self.swapper = swapper
+
+    def invoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        with self.swapper.acquire() as chain:
+            return chain.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        with self.swapper.acquire() as chain:
+            return await chain.ainvoke(input, config, **kwargs)
+
+    def stream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[str]:
+        with self.swapper.acquire() as chain:
+            yield from chain.stream(input, config, **kwargs)
+
+    async def astream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[str]:
+        with self.swapper.acquire() as chain:
+            async for token in chain.astream(input, config, **kwargs):
+                yield token
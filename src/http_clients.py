@@ -0,0 +1,37 @@
+# src/http_clients.py
+import threading
+from typing import Optional
+
+import httpx
+
+import config
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide connection pool used by all synchronous OpenAI clients."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(limits=_limits(), timeout=config.HTTP_TIMEOUT_SECONDS)
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the process-wide connection pool used by all async OpenAI clients."""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(limits=_limits(), timeout=config.HTTP_TIMEOUT_SECONDS)
+        return _async_client
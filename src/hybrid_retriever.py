@@ -0,0 +1,129 @@
+# src/hybrid_retriever.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from src.corpus import ShardedLexicalIndex
+from src.lexical_index import LexicalIndex, is_identifier_query
+from src.metrics import observe_stage, span
+from src.vector_index import documents_at, search_positions
+import config
+
+
+class HybridRetriever(BaseRetriever):
+    """Retrieves chunks with BM25 and FAISS, fused by reciprocal rank.
+
+    Identifier queries ("INS 211", "Ponceau 4R") take a lexical-only path that needs no query
+    embedding; everything else runs both searches and merges them.
+    """
+
+    vector_store: FAISS
+    # A corpus index searches the BM25 index of every shard
+    lexical: Union[LexicalIndex, ShardedLexicalIndex]
+    k: int = config.RETRIEVER_K
+    candidates: int = config.HYBRID_CANDIDATES
+    rrf_k: int = config.RRF_K
+    _latencies: Dict[str, deque] = PrivateAttr(default_factory=dict)
+    # Request threads record latencies while latency_stats reads them
+    _latencies_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _record(self, path: str, seconds: float):
+        with self._latencies_lock:
+            self._latencies.setdefault(path, deque(maxlen=1000)).append(seconds * 1000)
+
+    def _vector_search(self, query: str) -> List[int]:
+        with span("query_embedding"):
+            embedding = self.vector_store.embeddings.embed_query(query)
+        with span("faiss_search"):
+            return search_positions(self.vector_store, [embedding], self.candidates)[0]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._retrieve(query, self._vector_search)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Only the query embedding is awaited; BM25, FAISS and the chunk store are local and fast
+        lexical = self.lexical_search(query)
+        if not self.needs_vector_search(query, lexical):
+            return self._retrieve(query, self._vector_search, lexical)
+        with span("query_embedding"):
+            embedding = await self.vector_store.embeddings.aembed_query(query)
+        with span("faiss_search"):
+            positions = search_positions(self.vector_store, [embedding], self.candidates)[0]
+        return self.retrieve_with_positions(query, positions, lexical)
+
+    def lexical_search(self, query: str) -> Tuple[List[int], float]:
+        """Runs the BM25 search; returns (candidate positions, best first, and the seconds it took)."""
+        start = time.perf_counter()
+        lexical = [position for position, _ in self.lexical.search(query, self.candidates)]
+        seconds = time.perf_counter() - start
+        self._record("lexical", seconds)
+        observe_stage("lexical_search", seconds)
+        return lexical, seconds
+
+    @staticmethod
+    def needs_vector_search(query: str, lexical: Tuple[List[int], float]) -> bool:
+        """False for identifier queries that the BM25 results answer alone (the lexical fast path)."""
+        return not (lexical[0] and is_identifier_query(query))
+
+    def retrieve_with_positions(
+        self, query: str, vector_positions: List[int], lexical: Optional[Tuple[List[int], float]] = None
+    ) -> List[Document]:
+        """Fuses BM25 with FAISS results that were already searched for, e.g. in a batch.
+
+        lexical is this query's lexical_search result, if the caller already ran it.
+        """
+        return self._retrieve(query, lambda _: vector_positions, lexical)
+
+    def _retrieve(
+        self, query: str, vector_search, lexical: Optional[Tuple[List[int], float]] = None
+    ) -> List[Document]:
+        lexical, lexical_seconds = lexical or self.lexical_search(query)
+        # Timed from the BM25 search, which the caller may have run earlier
+        start = time.perf_counter() - lexical_seconds
+
+        if not self.needs_vector_search(query, (lexical, lexical_seconds)):
+            positions = lexical[:self.k]
+            logging.info(f"Retrieval (lexical fast path): {lexical_seconds * 1000:.1f} ms")
+        else:
+            vector_start = time.perf_counter()
+            vector = vector_search(query)
+            vector_seconds = time.perf_counter() - vector_start
+            self._record("vector", vector_seconds)
+
+            scores: Dict[int, float] = {}
+            for ranking in (lexical, vector):
+                for rank, position in enumerate(ranking):
+                    scores[position] = scores.get(position, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            positions = sorted(scores, key=scores.get, reverse=True)[:self.k]
+            logging.info(
+                f"Retrieval (hybrid): lexical {lexical_seconds * 1000:.1f} ms, vector {vector_seconds * 1000:.1f} ms"
+            )
+
+        with span("chunk_fetch"):
+            docs = documents_at(self.vector_store, positions)
+        self._record("total", time.perf_counter() - start)
+        return docs
+
+    def latency_stats(self) -> Dict[str, dict]:
+        """Returns count / p50 / p95 latency in milliseconds per retrieval path (last 1000 queries)."""
+        with self._latencies_lock:
+            latencies = {path: list(values) for path, values in self._latencies.items()}
+        stats = {}
+        for path, values in latencies.items():
+            ordered = sorted(values)
+            stats[path] = {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            }
+        return stats
@@ -0,0 +1,84 @@
+# src/index_manifest.py
+import hashlib
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+def assign_chunk_ids(chunks: List[Document]) -> List[str]:
+    """Derives a stable, content-addressed id for every chunk."""
+    seen = Counter()
+    ids = []
+    for chunk in chunks:
+        page = chunk.metadata.get("page")
+        kind = chunk.metadata.get("type", "text")
+        content_hash = hashlib.sha256(f"{page}\0{kind}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+        # Identical chunks on the same page still need distinct ids
+        occurrence = seen[content_hash]
+        seen[content_hash] += 1
+        ids.append(f"p{page}-{content_hash[:16]}-{occurrence}")
+    return ids
+
+
+class IndexManifest:
+    """Records the page and chunk content hashes stored in a vector index."""
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, source: str, pages: Optional[Dict[int, dict]] = None):
+        self.source = source
+        # page number -> {"hash": page content hash, "chunks": [chunk ids],
+        #                 "duplicates": {chunk id dropped as a near duplicate: page of the chunk it duplicates}}
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, index_path: Path) -> Optional["IndexManifest"]:
+        """Loads the manifest stored next to an index, if there is one."""
+        manifest_path = Path(index_path) / cls.FILENAME
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        pages = {int(page): entry for page, entry in data["pages"].items()}
+        return cls(data["source"], pages)
+
+    def save(self, index_path: Path):
+        """Writes the manifest next to the index."""
+        manifest_path = Path(index_path) / self.FILENAME
+        data = {"source": self.source, "pages": {str(page): entry for page, entry in sorted(self.pages.items())}}
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        logging.info(f"Index manifest saved with {len(self.pages)} pages.")
+
+    def diff(self, page_hashes: Dict[int, str]) -> Tuple[List[int], List[int]]:
+        """Returns (pages to re-index, pages no longer in the document).
+
+        Pages to re-index are the changed or new ones, plus unchanged pages that dropped a chunk as a
+        duplicate of a chunk on a changed or removed page; that chunk may now have to be indexed.
+        """
+        changed = {
+            page for page, page_hash in page_hashes.items()
+            if self.pages.get(page, {}).get("hash") != page_hash
+        }
+        removed = sorted(page for page in self.pages if page not in page_hashes)
+        affected = changed | set(removed)
+        for page, entry in self.pages.items():
+            if page in page_hashes and affected.intersection(entry.get("duplicates", {}).values()):
+                changed.add(page)
+        return sorted(changed), removed
+
+    def chunk_ids(self, pages: List[int]) -> List[str]:
+        """Returns the ids of all chunks stored for the given pages."""
+        return [chunk_id for page in pages for chunk_id in self.pages.get(page, {}).get("chunks", [])]
+
+    def set_page(self, page: int, page_hash: str, chunk_ids: List[str], duplicates: Optional[Dict[str, int]] = None):
+        self.pages[page] = {"hash": page_hash, "chunks": chunk_ids}
+        if duplicates:
+            self.pages[page]["duplicates"] = dict(duplicates)
+
+    def remove_page(self, page: int):
+        self.pages.pop(page, None)
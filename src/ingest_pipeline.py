@@ -0,0 +1,186 @@
+# src/ingest_pipeline.py
+import logging
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+from src.batch_embedder import BatchEmbedder
+from src.deduplicator import ChunkDeduplicator
+from src.document_processor import DocumentProcessor
+from src.index_manifest import assign_chunk_ids
+import config
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class PipelineError(RuntimeError):
+    """Raised in the caller when one of the pipeline stages fails."""
+
+
+class IngestPipeline:
+    """Streams pages through extraction -> chunking -> embedding -> index append.
+
+    Stages run in their own threads and are connected by bounded queues, so PDF parsing
+    overlaps with network-bound embedding and only a few pages are held in memory at once.
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        embedder: BatchEmbedder,
+        queue_size: int = config.PIPELINE_QUEUE_SIZE,
+        embed_batch_size: int = config.PIPELINE_EMBED_BATCH_SIZE,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+    ):
+        self.processor = processor
+        self.embedder = embedder
+        if deduplicator is None and config.DEDUP_ENABLED:
+            deduplicator = ChunkDeduplicator()
+        self.deduplicator = deduplicator
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    @property
+    def duplicates(self) -> Dict[int, Dict[str, int]]:
+        """Per page, the chunk ids dropped as duplicates of a chunk on another page, and that page."""
+        return self.deduplicator.duplicates if self.deduplicator is not None else {}
+
+    def _put(self, out_queue: queue.Queue, item) -> bool:
+        """Puts an item, giving up if another stage failed; returns False when stopping."""
+        while not self._stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, in_queue: queue.Queue):
+        """Gets an item, returning _DONE if another stage failed."""
+        while not self._stop.is_set():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _run_stage(self, name: str, target, *args):
+        """Runs a stage, recording its failure and stopping the other stages."""
+        def runner():
+            try:
+                target(*args)
+            except BaseException as e:
+                logging.error(f"Ingest pipeline stage '{name}' failed: {e}")
+                self._errors.append(e)
+                self._stop.set()
+        thread = threading.Thread(target=runner, name=f"ingest-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _extract(self, pages: Optional[List[int]], out_queue: queue.Queue):
+        for page, docs in self.processor.iter_page_documents(pages):
+            if not self._put(out_queue, (page, docs)):
+                return
+        self._put(out_queue, _DONE)
+
+    def _chunk(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        while True:
+            item = self._get(in_queue)
+            if item is _DONE:
+                break
+            _, docs = item
+            chunks = self.processor.split(docs)
+            # Chunk ids only depend on the page's own chunks, so they can be assigned per page
+            ids = assign_chunk_ids(chunks)
+            if self.deduplicator is not None:
+                chunks, ids = self.deduplicator.filter(chunks, ids)
+            if chunks and not self._put(out_queue, (chunks, ids)):
+                return
+        self._put(out_queue, _DONE)
+
+    def _embed(self, in_queue: queue.Queue, out_queue: queue.Queue, skip_ids: Set[str]):
+        pending: List[Tuple] = []
+
+        def flush():
+            texts = [chunk.page_content for chunk, _ in pending]
+            vectors = self.embedder.embed(texts)
+            ok = self._put(out_queue, (list(pending), vectors))
+            pending.clear()
+            return ok
+
+        while True:
+            item = self._get(in_queue)
+            if item is _DONE:
+                break
+            chunks, ids = item
+            # Chunks already in the index (incremental runs) are only recorded, not re-embedded
+            existing = [(chunk, chunk_id) for chunk, chunk_id in zip(chunks, ids) if chunk_id in skip_ids]
+            if existing and not self._put(out_queue, (existing, None)):
+                return
+            pending.extend((chunk, chunk_id) for chunk, chunk_id in zip(chunks, ids) if chunk_id not in skip_ids)
+            if len(pending) >= self.embed_batch_size and not flush():
+                return
+        if pending and not flush():
+            return
+        self._put(out_queue, _DONE)
+
+    def run(
+        self,
+        embedding_model,
+        pages: Optional[List[int]] = None,
+        vector_db: Optional[FAISS] = None,
+        skip_ids: Optional[Set[str]] = None,
+    ) -> Tuple[Optional[FAISS], Dict[int, List[str]]]:
+        """Runs the pipeline, appending to vector_db (or a new store).
+
+        Returns the vector store and the chunk ids seen per page.
+        """
+        self._stop.clear()
+        self._errors = []
+        pages_queue = queue.Queue(maxsize=self.queue_size)
+        chunks_queue = queue.Queue(maxsize=self.queue_size)
+        vectors_queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            self._run_stage("extract", self._extract, pages, pages_queue),
+            self._run_stage("chunk", self._chunk, pages_queue, chunks_queue),
+            self._run_stage("embed", self._embed, chunks_queue, vectors_queue, skip_ids or set()),
+        ]
+
+        # Index append runs in the calling thread
+        ids_by_page = defaultdict(list)
+        added = 0
+        try:
+            while True:
+                item = self._get(vectors_queue)
+                if item is _DONE:
+                    break
+                entries, vectors = item
+                for chunk, chunk_id in entries:
+                    ids_by_page[chunk.metadata["page"]].append(chunk_id)
+                if vectors is None or not entries:
+                    continue
+                text_embeddings = [(chunk.page_content, vector) for (chunk, _), vector in zip(entries, vectors)]
+                metadatas = [chunk.metadata for chunk, _ in entries]
+                ids = [chunk_id for _, chunk_id in entries]
+                if vector_db is None:
+                    vector_db = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=ids)
+                else:
+                    vector_db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                added += len(entries)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise PipelineError(f"Ingest pipeline failed: {self._errors[0]}") from self._errors[0]
+        logging.info(f"Ingest pipeline appended {added} chunks from {len(ids_by_page)} pages to the index.")
+        if self.deduplicator is not None:
+            logging.info(f"Deduplication stats: {self.deduplicator.stats()}")
+        return vector_db, ids_by_page
@@ -0,0 +1,140 @@
+# src/lexical_index.py
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.chunk_store import connect_read_only
+import config
+
+FILENAME = "lexical.sqlite"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+# "E211", "INS 211" and "211" should all match the same chunks
+E_NUMBER = re.compile(r"^e(\d{3,4}[a-z]?)$")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "the", "to", "what", "which", "with", "when", "where", "does", "do", "use", "used",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens with E numbers folded onto their INS number."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        match = E_NUMBER.match(token)
+        tokens.append(match.group(1) if match else token)
+    return tokens
+
+
+def is_identifier_query(query: str) -> bool:
+    """True for short queries made up mostly of identifiers, e.g. 'INS 211' or 'Ponceau 4R'."""
+    tokens = tokenize(query)
+    if not tokens or len(tokens) > config.LEXICAL_FAST_PATH_MAX_TOKENS:
+        return False
+    identifiers = sum(1 for token in tokens if any(ch.isdigit() for ch in token))
+    return identifiers * 2 >= len(tokens)
+
+
+def write_lexical_index(path: Path, entries: Iterable[Tuple[int, str, Document]]):
+    """Builds the BM25 postings for all chunks, keyed by index position, replacing the file atomically."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.executescript(
+            "CREATE TABLE header (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE docs (position INTEGER PRIMARY KEY, length INTEGER NOT NULL);"
+            "CREATE TABLE postings (term TEXT NOT NULL, position INTEGER NOT NULL, tf INTEGER NOT NULL);"
+        )
+        count = 0
+        total_length = 0
+        document_frequency = Counter()
+        for position, _, doc in entries:
+            counts = Counter(tokenize(doc.page_content))
+            length = sum(counts.values())
+            conn.execute("INSERT INTO docs VALUES (?, ?)", (position, length))
+            conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)", [(term, position, tf) for term, tf in counts.items()]
+            )
+            document_frequency.update(counts.keys())
+            count += 1
+            total_length += length
+        conn.execute("CREATE INDEX idx_postings_term ON postings (term)")
+        conn.execute("CREATE TABLE terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO terms VALUES (?, ?)", list(document_frequency.items()))
+        header = {"count": count, "avg_length": total_length / count if count else 0.0}
+        conn.executemany("INSERT INTO header VALUES (?, ?)", [(k, str(v)) for k, v in header.items()])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logging.info(f"Lexical index written with {count} chunks and {len(document_frequency)} terms.")
+
+
+class LexicalIndex:
+    """BM25 search over the chunk store, read from an indexed SQLite postings file."""
+
+    def __init__(self, path: Path, k1: float = config.BM25_K1, b: float = config.BM25_B):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        header = dict(self._connection().execute("SELECT key, value FROM header").fetchall())
+        self.count = int(header["count"])
+        self.avg_length = float(header["avg_length"]) or 1.0
+
+    @classmethod
+    def open(cls, index_path: Path) -> Optional["LexicalIndex"]:
+        path = Path(index_path) / FILENAME
+        if not path.exists():
+            logging.warning(f"No lexical index at {path}; re-run `ingest.py` to enable hybrid retrieval.")
+            return None
+        return cls(path)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_read_only(self.path)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Closes every thread's connection, e.g. when a replaced index snapshot is released."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (index position, BM25 score) pairs, best first."""
+        conn = self._connection()
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            row = conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                continue
+            idf = math.log(1 + (self.count - row[0] + 0.5) / (row[0] + 0.5))
+            for position, tf, length in conn.execute(
+                "SELECT p.position, p.tf, d.length FROM postings p JOIN docs d ON d.position = p.position "
+                "WHERE p.term = ?",
+                (term,),
+            ):
+                norm = tf + self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,271 @@
+# src/metrics.py
+"""
+In-process metrics: stage timing spans, token/cost counters and per-request traces.
+
+Metrics are rendered in the Prometheus text format (served by api.py at /metrics, or by
+start_metrics_server for the Gradio app). Set TRACE_LOG_PATH to also append every request's
+spans as one JSON line.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        """Returns count and total seconds per first label value."""
+        with self._lock:
+            return {key[0] if key else "": {"count": entry[2], "total_s": round(entry[1], 3)}
+                    for key, entry in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "fssai_stage_duration_seconds", "Duration of each RAG and ingestion stage.", ("stage",)
+)
+REQUEST_SECONDS = Histogram("fssai_request_duration_seconds", "End-to-end request duration.", ("endpoint",))
+REQUESTS = Counter("fssai_requests_total", "Requests served.", ("endpoint", "outcome"))
+TOKENS = Counter("fssai_tokens_total", "Tokens used per model.", ("model", "kind"))
+COST = Counter("fssai_cost_usd_total", "Estimated OpenAI cost in US dollars.", ("model",))
+METRICS = (STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, TOKENS, COST)
+
+
+class Trace:
+    """Spans and token usage of one request."""
+
+    def __init__(self, endpoint: str, **attributes):
+        self.id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.attributes = attributes
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float):
+        with self._lock:
+            self.spans.append({"stage": stage, "ms": round(seconds * 1000, 2)})
+
+    def add_tokens(self, kind: str, count: int):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("fssai_trace", default=None)
+_trace_log_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def detach_trace():
+    """Stops attributing spans in this context (e.g. a long-lived worker task) to the request that started it."""
+    _current_trace.set(None)
+
+
+def start_trace(endpoint: str, **attributes) -> Trace:
+    """Starts a request trace; spans recorded in this context (and tasks/threads it spawns) attach to it."""
+    trace = Trace(endpoint, **attributes)
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, outcome: str = "ok"):
+    """Records the request's duration and appends it to the trace log, if configured."""
+    seconds = trace.elapsed()
+    REQUEST_SECONDS.observe(seconds, endpoint=trace.endpoint)
+    REQUESTS.inc(endpoint=trace.endpoint, outcome=outcome)
+    if config.TRACE_LOG_PATH:
+        record = {
+            "trace_id": trace.id, "endpoint": trace.endpoint, "started": trace.started, "outcome": outcome,
+            "total_ms": round(seconds * 1000, 2), "spans": trace.spans, "tokens": trace.tokens,
+        }
+        record.update(trace.attributes)
+        with _trace_log_lock, open(config.TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def observe_stage(stage: str, seconds: float, traces: Optional[List[Optional[Trace]]] = None):
+    """Records a stage duration; work shared by several requests (a batch) passes their traces."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for trace in traces if traces is not None else [current_trace()]:
+        if trace is not None:
+            trace.add_span(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """Times a block as one stage of the current request (or ingestion run)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_usage(model: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Counts tokens and their estimated cost (MODEL_PRICES_PER_MILLION)."""
+    # Responses name dated snapshots ("gpt-4o-mini-2024-07-18"), so the longest matching prefix prices them
+    priced = [name for name in config.MODEL_PRICES_PER_MILLION if model.startswith(name)]
+    input_price, output_price = config.MODEL_PRICES_PER_MILLION[max(priced, key=len)] if priced else (0.0, 0.0)
+    trace = current_trace()
+    for kind, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+        if count:
+            TOKENS.inc(count, model=model, kind=kind)
+            if trace is not None:
+                trace.add_tokens(kind, count)
+    cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    if cost:
+        COST.inc(cost, model=model)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records time to first token, generation time and token usage of every LLM call."""
+
+    def __init__(self):
+        self._runs: Dict[Any, dict] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self._runs[run_id] = {"start": time.perf_counter(), "first_token": None}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        with self._lock:
+            self._runs[run_id] = {"start": time.perf_counter(), "first_token": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run["first_token"] is not None:
+                return
+            run["first_token"] = time.perf_counter()
+        observe_stage("time_to_first_token", run["first_token"] - run["start"])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            now = time.perf_counter()
+            observe_stage("generation", now - (run["first_token"] or run["start"]))
+        usage, model = {}, config.CHAT_MODEL
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+                    model = message.response_metadata.get("model_name", model)
+        if usage:
+            record_usage(model, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+def render() -> str:
+    """Returns all metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def stage_summary() -> Dict[str, dict]:
+    return STAGE_SECONDS.summary()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = config.METRICS_PORT) -> ThreadingHTTPServer:
+    """Serves /metrics from a background thread (for processes without their own HTTP API)."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Metrics available at http://0.0.0.0:{port}/metrics")
+    return server
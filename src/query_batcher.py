@@ -0,0 +1,172 @@
+# src/query_batcher.py
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.answer_cache import SemanticAnswerCache
+from src.hybrid_retriever import HybridRetriever
+from src.lexical_index import is_identifier_query
+from src.metrics import current_trace, detach_trace, observe_stage
+from src.vector_index import documents_at, search_positions
+import config
+
+
+class QueryBatcher:
+    """Retrieves concurrent queries together.
+
+    Queries arriving within window_ms of each other are embedded with one embeddings request
+    and searched with one FAISS call over the matrix of query vectors. Identifier queries that
+    BM25 can answer alone skip the batch. A query can be scoped to another vector store and
+    retriever (e.g. a subset of corpus documents); it still shares the embeddings request.
+    A query that brings a semantic answer cache is looked up in it right after embedding, and
+    skips the search on a hit.
+    """
+
+    def __init__(
+        self,
+        vector_store: FAISS,
+        retriever: Optional[HybridRetriever] = None,
+        window_ms: float = config.QUERY_BATCH_WINDOW_MS,
+        max_batch_size: int = config.QUERY_BATCH_MAX_SIZE,
+        k: int = config.RETRIEVER_K,
+    ):
+        self.vector_store = vector_store
+        self.retriever = retriever
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.k = k
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.queries = 0
+
+    async def retrieve(
+        self,
+        query: str,
+        vector_store: Optional[FAISS] = None,
+        retriever: Optional[HybridRetriever] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+    ) -> Tuple[List[Document], Optional[List[float]], Optional[str]]:
+        """Returns the retrieved chunks, the query embedding (None if none was needed) and the cached answer.
+
+        With answer_cache, a cached answer is returned without chunks; otherwise it is None.
+        """
+        if vector_store is None:
+            vector_store, retriever = self.vector_store, self.retriever
+        lexical = None
+        if retriever is not None and is_identifier_query(query):
+            # BM25 and the chunk fetch read SQLite, so they run in a thread (within this request's trace)
+            loop, context = asyncio.get_running_loop(), contextvars.copy_context()
+            # Kept for the fusion step if BM25 alone does not answer the query
+            lexical = await loop.run_in_executor(None, context.run, retriever.lexical_search, query)
+            if not retriever.needs_vector_search(query, lexical):
+                docs = await loop.run_in_executor(
+                    None, context.run, retriever.retrieve_with_positions, query, [], lexical
+                )
+                return docs, None, None
+        if self._worker is None:
+            # Started on first use so the queue and task belong to the serving event loop
+            self._queue = asyncio.Queue()
+            self._loop = asyncio.get_running_loop()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future, current_trace(), vector_store, retriever, answer_cache, lexical))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        """Waits for one query, then gathers the others that arrive within the window."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        # The worker outlives the request that started it; batch stages go to each member's trace
+        detach_trace()
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+            queries = [item[0] for item in batch]
+            traces = [item[2] for item in batch]
+            try:
+                start = time.perf_counter()
+                embeddings = await self.vector_store.embeddings.aembed_documents(queries)
+                observe_stage("query_embedding", time.perf_counter() - start, traces)
+                # FAISS and the SQLite chunk and BM25 stores block, so the rest runs off the event loop
+                results = await asyncio.get_running_loop().run_in_executor(
+                    None, self._search_batch, batch, embeddings
+                )
+                self.batches += 1
+                self.queries += len(batch)
+                logging.info(f"Retrieved a batch of {len(batch)} queries with one embedding call and one search.")
+                for (_, future, *_), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _search_batch(self, batch: List[tuple], embeddings: List[List[float]]) -> List[tuple]:
+        """Checks the answer cache, searches and fetches chunks; returns (docs, embedding, cached answer) per query."""
+        traces = [item[2] for item in batch]
+        # Questions answered from the cache are resolved before the search
+        cached: List[Optional[str]] = [
+            item[5].lookup_vector(embedding)[0] if item[5] is not None else None
+            for item, embedding in zip(batch, embeddings)
+        ]
+        # One FAISS search per scope over the matrix of its queries' vectors
+        scopes: Dict[int, List[int]] = {}
+        for i, item in enumerate(batch):
+            if cached[i] is None:
+                scopes.setdefault(id(item[3]), []).append(i)
+        positions: List[List[int]] = [[] for _ in batch]
+        start = time.perf_counter()
+        for members in scopes.values():
+            vector_store, retriever = batch[members[0]][3:5]
+            candidates = retriever.candidates if retriever is not None else self.k
+            found = search_positions(vector_store, [embeddings[i] for i in members], candidates)
+            for i, query_positions in zip(members, found):
+                positions[i] = query_positions
+        observe_stage("faiss_search", time.perf_counter() - start, traces)
+
+        results = []
+        for (query, _, _, vector_store, retriever, _, lexical), embedding, query_positions, answer in zip(
+            batch, embeddings, positions, cached
+        ):
+            if answer is not None:
+                docs = []
+            elif retriever is not None:
+                docs = retriever.retrieve_with_positions(query, query_positions, lexical)
+            else:
+                docs = documents_at(vector_store, query_positions)
+            results.append((docs, embedding, answer))
+        return results
+
+    def close(self):
+        """Stops the batching worker; safe to call from any thread."""
+        if self._worker is not None:
+            self._loop.call_soon_threadsafe(self._worker.cancel)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
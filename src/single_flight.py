@@ -0,0 +1,192 @@
+# src/single_flight.py
+import asyncio
+import contextvars
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+def question_key(question: str) -> str:
+    """Normalizes a question so trivially different copies share one flight."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+class _Flight:
+    """One in-progress computation whose output items are replayed to every subscriber."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.event: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent requests into one computation.
+
+    The first request for a key starts the producer; later requests for the same key attach to
+    it and receive every item produced so far followed by the rest of the stream. The producer
+    is cancelled only when all of its subscribers have gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._flights
+
+    def _join(self, key: str):
+        """Returns (flight, whether this caller must start it)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+                logging.info(f"Coalesced a duplicate in-flight request ({self.coalesced} so far).")
+            flight.subscribers += 1
+            return flight, leader
+
+    def _finish(self, key: str, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _leave(self, key: str, flight: _Flight) -> bool:
+        """Drops a subscriber; returns True if it was the last one and the flight is unfinished."""
+        with self._lock:
+            flight.subscribers -= 1
+            abandon = flight.subscribers == 0 and not flight.done
+            if abandon:
+                flight.cancelled = True
+                # New requests for the key start over rather than join a cancelled flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            return abandon
+
+    def stream(self, key: str, factory: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Yields the items of factory(), shared with concurrent callers using the same key."""
+        flight, leader = self._join(key)
+        if leader:
+            # The producer runs in the leader's context, so its request trace follows it
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(self._produce, key, flight, factory), daemon=True).start()
+        position = 0
+        try:
+            while True:
+                with flight.condition:
+                    while position == len(flight.items) and not flight.done:
+                        flight.condition.wait()
+                    items = flight.items[position:]
+                    done, error = flight.done, flight.error
+                for item in items:
+                    yield item
+                position += len(items)
+                if done and position == len(flight.items):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self._leave(key, flight)
+
+    def _produce(self, key: str, flight: _Flight, factory: Callable[[], Iterator[Any]]):
+        iterator = factory()
+        try:
+            for item in iterator:
+                if flight.cancelled:
+                    break
+                with flight.condition:
+                    flight.items.append(item)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            if hasattr(iterator, "close"):
+                # Closing the chain's stream aborts the LLM call when every subscriber left
+                iterator.close()
+            self._finish(key, flight)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    async def astream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Async version of stream(); the producer runs as a task on the current event loop."""
+        flight, leader = self._join(key)
+        if leader:
+            flight.event = asyncio.Event()
+            flight.task = asyncio.create_task(self._aproduce(key, flight, factory))
+        position = 0
+        try:
+            while True:
+                event = flight.event
+                items = flight.items[position:]
+                for item in items:
+                    yield item
+                position += len(items)
+                if position < len(flight.items):
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await event.wait()
+        finally:
+            if self._leave(key, flight) and flight.task is not None:
+                flight.task.cancel()
+
+    async def _aproduce(self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for item in factory():
+                flight.items.append(item)
+                # Wake the current waiters and give later ones a fresh event
+                event, flight.event = flight.event, asyncio.Event()
+                event.set()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            flight.error = e
+        finally:
+            self._finish(key, flight)
+            flight.done = True
+            flight.event.set()
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "computations": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / total if total else 0.0,
+            "in_flight": len(self._flights),
+        }
+
+
+class SingleFlightChain(Runnable):
+    """Runs a question -> answer chain once for identical questions that are in flight together."""
+
+    def __init__(self, chain: Runnable, flights: Optional[SingleFlight] = None):
+        self.chain = chain
+        self.flights = flights or SingleFlight()
+
+    def invoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        return "".join(self.stream(input, config, **kwargs))
+
+    async def ainvoke(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        return "".join([token async for token in self.astream(input, config, **kwargs)])
+
+    def stream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[str]:
+        return self.flights.stream(question_key(input), lambda: self.chain.stream(input, config, **kwargs))
+
+    def astream(self, input: str, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[str]:
+        return self.flights.astream(question_key(input), lambda: self.chain.astream(input, config, **kwargs))
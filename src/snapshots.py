@@ -0,0 +1,138 @@
+# src/snapshots.py
+"""
+Versioned vector store snapshots.
+
+ingest.py writes every build into its own directory under <store>/snapshots/ and then publishes
+it by atomically replacing the <store>/CURRENT pointer file, so readers only ever open a complete
+snapshot. A store without a CURRENT file is read from <store> itself (the pre-snapshot layout).
+
+Every process reading a snapshot holds a shared lock on its LEASE file until it closes it, and
+pruning skips leased snapshots, so old ones are only deleted once nobody has them open.
+"""
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import IO, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where snapshots are pruned without checking leases
+    fcntl = None
+
+import config
+
+CURRENT_FILE = "CURRENT"
+SNAPSHOTS_DIR = "snapshots"
+LEASE_FILE = "LEASE"
+
+
+def current_snapshot(root: Path) -> Optional[str]:
+    """Returns the name of the published snapshot, or None for a store without snapshots."""
+    try:
+        return (Path(root) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_path(root: Path, name: Optional[str]) -> Path:
+    """Returns the directory of a snapshot (the store root itself for name=None)."""
+    return Path(root) / SNAPSHOTS_DIR / name if name else Path(root)
+
+
+def store_root(path: Path) -> Path:
+    """Returns the store root that a snapshot directory (or the root itself) belongs to."""
+    path = Path(path)
+    return path.parent.parent if path.parent.name == SNAPSHOTS_DIR else path
+
+
+def default_store_root() -> Path:
+    """Returns the store the servers read: the corpus index with CORPUS_ENABLED, else the single-PDF store."""
+    return config.CORPUS_INDEX_PATH if config.CORPUS_ENABLED else config.VECTOR_STORE_PATH
+
+
+def active_store_path(root: Path) -> Path:
+    """Returns the directory holding the currently published vector store."""
+    return snapshot_path(root, current_snapshot(root))
+
+
+def list_snapshots(root: Path) -> List[str]:
+    """Returns the snapshot names, oldest first (names start with their creation time)."""
+    directory = Path(root) / SNAPSHOTS_DIR
+    if not directory.exists():
+        return []
+    return sorted(entry.name for entry in directory.iterdir() if entry.is_dir())
+
+
+def new_snapshot(root: Path) -> Path:
+    """Creates an empty, unpublished snapshot directory."""
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = snapshot_path(root, name)
+    path.mkdir(parents=True)
+    return path
+
+
+def publish_snapshot(root: Path, path: Path, keep: int = config.SNAPSHOT_KEEP):
+    """Makes the snapshot at path the current one, then prunes old snapshots."""
+    root = Path(root)
+    tmp_file = root / (CURRENT_FILE + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(Path(path).name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, root / CURRENT_FILE)
+    logging.info(f"Published vector store snapshot {Path(path).name}.")
+    prune_snapshots(root, keep)
+
+
+def lease_snapshot(path: Path) -> Optional[IO]:
+    """Marks a snapshot as open until the returned lease is closed (None for a store without snapshots).
+
+    The lock is released by the OS if the process dies, so a crashed reader never pins a snapshot.
+    """
+    path = Path(path)
+    if fcntl is None or path.parent.name != SNAPSHOTS_DIR:
+        return None
+    lease = open(path / LEASE_FILE, "a")
+    fcntl.flock(lease, fcntl.LOCK_SH)
+    return lease
+
+
+def is_leased(path: Path) -> bool:
+    """Returns whether any process (this one included) holds a lease on the snapshot at path."""
+    if fcntl is None:
+        return False
+    try:
+        lease = open(Path(path) / LEASE_FILE, "a")
+    except FileNotFoundError:
+        return False
+    with lease:
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lease, fcntl.LOCK_UN)
+        return False
+
+
+def discard_snapshot(path: Path):
+    """Removes a snapshot that was never published, e.g. after a failed ingestion."""
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def prune_snapshots(root: Path, keep: int = config.SNAPSHOT_KEEP):
+    """Deletes all but the current snapshot and the keep most recent others.
+
+    Older snapshots still leased by a reader are kept; a later prune removes them once released.
+    """
+    current = current_snapshot(root)
+    others = [name for name in list_snapshots(root) if name != current]
+    for name in others[:max(0, len(others) - keep)]:
+        path = snapshot_path(root, name)
+        if is_leased(path):
+            logging.info(f"Keeping old vector store snapshot {name}, which is still open.")
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        logging.info(f"Removed old vector store snapshot {name}.")
@@ -0,0 +1,74 @@
+# src/startup.py
+"""
+Startup-time profile of a serving process: how long the interpreter, imports and each init
+phase (env load, vector store load, chain build, UI build, ...) took before it could serve.
+
+Entry points import this module before their heavy dependencies; the time from then until the
+first startup_phase() is counted as "imports". Only the standard library is imported here.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+_imported_at = time.perf_counter()
+_phases: Dict[str, float] = {}
+_last_phase_end: Optional[float] = None
+_reported = False
+_lock = threading.Lock()
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process was started (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Interpreter start-up and the imports that ran before this module (e.g. the stdlib, config)
+_interpreter_seconds = _process_age()
+
+
+def _record(name: str, seconds: float):
+    with _lock:
+        if not _reported:
+            _phases[name] = _phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Times a startup phase; phases running after startup_report() (e.g. a hot swap) are not recorded."""
+    global _last_phase_end
+    start = time.perf_counter()
+    if _last_phase_end is None:
+        # Everything the entry point imported before its first phase
+        _record("imports", start - _imported_at)
+    try:
+        yield
+    finally:
+        _last_phase_end = time.perf_counter()
+        _record(name, _last_phase_end - start)
+
+
+def startup_report(process: str = "server") -> Dict[str, float]:
+    """Logs the startup phases recorded so far and returns them (in seconds) with their total."""
+    global _reported
+    with _lock:
+        _reported = True
+        phases = {}
+        if _interpreter_seconds is not None:
+            phases["interpreter"] = _interpreter_seconds
+        phases.update(_phases)
+    phases["total"] = sum(phases.values())
+    logging.info(
+        f"Startup of {process} took {phases['total']:.2f}s: "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in phases.items() if name != "total")
+    )
+    return {name: round(seconds, 3) for name, seconds in phases.items()}
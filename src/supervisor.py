@@ -0,0 +1,214 @@
+# src/supervisor.py
+"""
+Runs serving worker processes, restarts the ones that die and reports their startup time and memory.
+
+Workers are started with the "spawn" method, so each one opens the vector store itself. With the
+FAISS index and the SQLite stores memory-mapped read-only, those opens map the same files, and
+the index and chunk pages are shared through the OS page cache rather than copied per worker.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import config
+
+
+def process_memory(pid="self") -> Dict[str, float]:
+    """Returns a process's RSS, PSS, private and shared memory in MB (Linux /proc; empty elsewhere).
+
+    Private memory is what the process adds on its own; shared pages (e.g. a memory-mapped index
+    used by several workers) are counted once across processes by PSS.
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    values[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss_mb": values.get("Rss", 0.0),
+        "pss_mb": values.get("Pss", 0.0),
+        "private_mb": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+        "shared_mb": values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0),
+    }
+
+
+def _run_worker(target: Callable, index: int, reports, spawned_at: float):
+    """Process entry point: runs target(index, ready); ready(**phase_seconds) reports the worker as serving."""
+
+    def ready(**phases):
+        reports.put({
+            "event": "ready",
+            "worker": index,
+            "pid": os.getpid(),
+            "startup_seconds": time.time() - spawned_at,
+            "phases": phases,
+        })
+
+    try:
+        target(index, ready)
+    except Exception as e:
+        reports.put({"event": "error", "worker": index, "pid": os.getpid(), "error": str(e)})
+        raise
+
+
+class WorkerSupervisor:
+    """Keeps a number of worker processes running target(index, ready).
+
+    A worker that exits is restarted after restart_delay seconds; one that dies max_start_failures
+    times in a row before becoming ready stops the supervisor instead of crash-looping.
+    """
+
+    def __init__(
+        self,
+        target: Callable,
+        workers: int = config.SERVE_WORKERS,
+        restart_delay: float = config.WORKER_RESTART_DELAY_SECONDS,
+        max_start_failures: int = config.WORKER_MAX_START_FAILURES,
+        report_path: Optional[Path] = None,
+        report_every: float = 0,
+    ):
+        self.target = target
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_start_failures = max_start_failures
+        self.report_path = report_path
+        self.report_every = report_every
+        self._context = multiprocessing.get_context("spawn")
+        self._reports = self._context.Queue()
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._ready: Dict[int, dict] = {}
+        self._start_failures: Dict[int, int] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._stopping = False
+        self.restarts = 0
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_run_worker, args=(self.target, index, self._reports, time.time()),
+            name=f"worker-{index}", daemon=False,
+        )
+        process.start()
+        self._processes[index] = process
+        self._ready.pop(index, None)
+        logging.info(f"Started worker {index} (pid {process.pid}).")
+
+    def run(self):
+        """Starts the workers and supervises them until SIGINT/SIGTERM, then stops them all."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: setattr(self, "_stopping", True))
+        for index in range(self.workers):
+            self._spawn(index)
+        next_report = None
+        try:
+            while not self._stopping:
+                self._drain(timeout=1.0)
+                self._check()
+                if next_report is None and len(self._ready) == self.workers:
+                    self.report()
+                    next_report = time.monotonic() + self.report_every if self.report_every else float("inf")
+                elif next_report is not None and time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + self.report_every
+        finally:
+            self.stop()
+
+    def _drain(self, timeout: float):
+        try:
+            message = self._reports.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            if message["event"] == "ready":
+                self._ready[message["worker"]] = message
+                self._start_failures[message["worker"]] = 0
+                logging.info(f"Worker {message['worker']} ready in {message['startup_seconds']:.2f}s.")
+            else:
+                logging.error(f"Worker {message['worker']} failed: {message['error']}")
+            try:
+                message = self._reports.get_nowait()
+            except queue.Empty:
+                return
+
+    def _check(self):
+        now = time.monotonic()
+        for index, process in list(self._processes.items()):
+            if process.is_alive() or self._stopping:
+                continue
+            if index not in self._restart_at:
+                if index not in self._ready:
+                    self._start_failures[index] = self._start_failures.get(index, 0) + 1
+                    if self._start_failures[index] >= self.max_start_failures:
+                        logging.error(
+                            f"Worker {index} died {self._start_failures[index]} times before becoming ready; "
+                            f"stopping all workers."
+                        )
+                        self._stopping = True
+                        return
+                logging.warning(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}; restarting.")
+                self._restart_at[index] = now + self.restart_delay
+            elif now >= self._restart_at[index]:
+                del self._restart_at[index]
+                self.restarts += 1
+                self._spawn(index)
+
+    def stop(self, timeout: float = 10.0):
+        """Asks every worker to exit, and kills the ones still running after timeout seconds."""
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        logging.info("All workers stopped.")
+
+    def report(self) -> dict:
+        """Logs (and optionally writes as JSON) each worker's startup time and current memory use."""
+        workers = []
+        for index in sorted(self._ready):
+            ready = self._ready[index]
+            workers.append({
+                "worker": index,
+                "pid": ready["pid"],
+                "startup_seconds": round(ready["startup_seconds"], 3),
+                "phases": ready["phases"],
+                "memory": process_memory(ready["pid"]),
+            })
+        totals = {
+            "workers": len(workers),
+            "restarts": self.restarts,
+            "rss_mb": sum(worker["memory"].get("rss_mb", 0.0) for worker in workers),
+            # Shared pages are split between the processes mapping them, so this is the real footprint
+            "pss_mb": sum(worker["memory"].get("pss_mb", 0.0) for worker in workers),
+        }
+        report = {"workers": workers, "totals": totals}
+
+        logging.info(f"{'worker':>6}{'pid':>8}{'startup s':>11}{'rss MB':>9}{'private MB':>12}{'shared MB':>11}")
+        for worker in workers:
+            memory = worker["memory"]
+            logging.info(
+                f"{worker['worker']:>6}{worker['pid']:>8}{worker['startup_seconds']:>11.2f}"
+                f"{memory.get('rss_mb', 0):>9.0f}{memory.get('private_mb', 0):>12.0f}{memory.get('shared_mb', 0):>11.0f}"
+                f"  {worker['phases']}"
+            )
+        logging.info(
+            f"{totals['workers']} workers: {totals['pss_mb']:.0f} MB in total (RSS sum {totals['rss_mb']:.0f} MB); "
+            f"each worker adds its private memory on top of the shared index pages."
+        )
+        if self.report_path is not None:
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,83 @@
+# src/table_detector.py
+import logging
+from collections import Counter, defaultdict
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+
+import config
+
+
+class TablePageClassifier:
+    """Cheap PyMuPDF pass that flags pages likely to contain tables."""
+
+    def __init__(
+        self,
+        min_ruling_lines: int = config.TABLE_DETECTION_MIN_RULING_LINES,
+        min_aligned_rows: int = config.TABLE_DETECTION_MIN_ALIGNED_ROWS,
+        min_columns: int = config.TABLE_DETECTION_MIN_COLUMNS,
+        column_gap: float = config.TABLE_DETECTION_COLUMN_GAP,
+    ):
+        self.min_ruling_lines = min_ruling_lines
+        self.min_aligned_rows = min_aligned_rows
+        self.min_columns = min_columns
+        self.column_gap = column_gap
+
+    def _ruling_lines(self, page) -> int:
+        """Counts long horizontal and vertical strokes drawn on the page."""
+        min_length = page.rect.width * 0.1
+        count = 0
+        for drawing in page.get_drawings():
+            for item in drawing["items"]:
+                if item[0] == "l":
+                    p1, p2 = item[1], item[2]
+                    if (abs(p1.y - p2.y) < 1 and abs(p1.x - p2.x) > min_length) or \
+                            (abs(p1.x - p2.x) < 1 and abs(p1.y - p2.y) > min_length / 4):
+                        count += 1
+                elif item[0] == "re":
+                    rect = item[1]
+                    # Thin filled rectangles are how many generators draw rules
+                    if (rect.height < 2 and rect.width > min_length) or (rect.width < 2 and rect.height > min_length / 4):
+                        count += 1
+                    elif rect.width > min_length / 4 and rect.height > 2:
+                        count += 2  # Boxed cell: counts as one horizontal and one vertical edge
+        return count
+
+    def _aligned_rows(self, page) -> int:
+        """Counts text rows that split into several cells starting at recurring x positions."""
+        rows = defaultdict(list)
+        for x0, y0, x1, y1, *_ in page.get_text("words"):
+            rows[round((y0 + y1) / 6)].append((x0, x1))
+
+        cell_starts = []
+        for words in rows.values():
+            words.sort()
+            starts = [words[0][0]]
+            for (_, prev_x1), (x0, _) in zip(words, words[1:]):
+                if x0 - prev_x1 > self.column_gap:
+                    starts.append(x0)
+            if len(starts) >= self.min_columns:
+                cell_starts.append([round(x / 5) for x in starts])
+
+        # Column starts shared by enough rows indicate a real grid rather than ragged prose
+        column_counts = Counter(x for starts in cell_starts for x in set(starts))
+        columns = {x for x, n in column_counts.items() if n >= self.min_aligned_rows}
+        return sum(1 for starts in cell_starts if len(columns.intersection(starts)) >= self.min_columns)
+
+    def is_table_page(self, page) -> bool:
+        """Returns True if the page has ruling lines or column-aligned rows."""
+        if self._ruling_lines(page) >= self.min_ruling_lines:
+            return True
+        return self._aligned_rows(page) >= self.min_aligned_rows
+
+    def candidate_pages(self, pdf_path: str, pages: Optional[List[int]] = None) -> List[int]:
+        """Returns the 1-based pages worth running Camelot on."""
+        with fitz.open(str(pdf_path)) as pdf:
+            page_numbers = pages if pages is not None else range(1, pdf.page_count + 1)
+            candidates = [number for number in page_numbers if self.is_table_page(pdf[number - 1])]
+            scanned = len(page_numbers)
+        logging.info(
+            f"Table pre-classification: {len(candidates)} candidate pages, "
+            f"skipped {scanned - len(candidates)} of {scanned} pages."
+        )
+        return candidates
@@ -0,0 +1,214 @@
+# src/vector_index.py
+import logging
+import math
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.chunk_store import ChunkStore, PositionMap, write_chunk_store
+from src.lexical_index import FILENAME as LEXICAL_FILENAME, write_lexical_index
+import config
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+
+
+def search_index_path(path: Path, index_type: str) -> Path:
+    """Returns where the search index of a given type is stored inside a vector store directory."""
+    if index_type == "flat":
+        return Path(path) / "index.faiss"
+    return Path(path) / f"index.{index_type}.faiss"
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str = config.FAISS_INDEX_TYPE) -> faiss.Index:
+    """Builds (and trains, where needed) a FAISS index of the given type over the vectors."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    count, dim = vectors.shape
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.FAISS_HNSW_M)
+        index.hnsw.efConstruction = config.FAISS_HNSW_EF_CONSTRUCTION
+    elif index_type in ("ivf", "ivfpq"):
+        # Rule of thumb: ~4*sqrt(n) lists, with at least 39 training points per list
+        nlist = config.FAISS_IVF_NLIST or int(4 * math.sqrt(count))
+        nlist = max(1, min(nlist, count // 39))
+        if index_type == "ivfpq" and count < 2 ** config.FAISS_PQ_NBITS:
+            logging.warning(f"Only {count} vectors; too few to train PQ codes. Building a flat index instead.")
+            index = faiss.IndexFlatL2(dim)
+        else:
+            quantizer = faiss.IndexFlatL2(dim)
+            if index_type == "ivf":
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+            else:
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.FAISS_PQ_M, config.FAISS_PQ_NBITS)
+            logging.info(f"Training {index_type} index with {nlist} lists on {count} vectors...")
+            index.train(vectors)
+    else:
+        index = faiss.IndexFlatL2(dim)
+
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index: faiss.Index):
+    """Applies the configured query-time parameters (efSearch / nprobe) to an index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.FAISS_HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(config.FAISS_IVF_NPROBE, index.nlist)
+
+
+def flat_vectors(index: faiss.Index) -> np.ndarray:
+    """Returns all vectors stored in an exact (flat) index, in insertion order."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def save_search_index(vector_db: FAISS, path: Path, index_type: str = config.FAISS_INDEX_TYPE):
+    """Writes the configured approximate index next to the exact index of a saved vector store.
+
+    The flat index stays the source of truth (incremental updates edit it); the search index is
+    rebuilt from its vectors, keeping the same positions so the chunk store is shared.
+    """
+    for stale in INDEX_TYPES[1:]:
+        if stale != index_type:
+            search_index_path(path, stale).unlink(missing_ok=True)
+    if index_type == "flat":
+        return
+    index = build_faiss_index(flat_vectors(vector_db.index), index_type)
+    _write_index(index, search_index_path(path, index_type))
+    logging.info(f"Saved {index_type} search index with {index.ntotal} vectors.")
+
+
+def _write_index(index: faiss.Index, index_file: Path):
+    """Writes a FAISS index through a temporary file so readers never see a partial file."""
+    tmp_file = index_file.with_name(index_file.name + ".tmp")
+    faiss.write_index(index, str(tmp_file))
+    os.replace(tmp_file, index_file)
+
+
+def save_vector_store(vector_db: FAISS, path: Path, index_type: str = config.FAISS_INDEX_TYPE):
+    """Saves the exact index, the chunk store, the BM25 index and the configured search index (no pickle)."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    _write_index(vector_db.index, search_index_path(path, "flat"))
+    write_chunk_store(
+        path / ChunkStore.FILENAME,
+        vector_db.docstore,
+        vector_db.index_to_docstore_id,
+        header={"embedding_model": config.EMBEDDING_MODEL, "dimension": str(vector_db.index.d)},
+    )
+    # Tokenizing is cheap next to embedding, so the BM25 index is rebuilt from the chunk store each time
+    chunks = ChunkStore(path / ChunkStore.FILENAME)
+    try:
+        write_lexical_index(path / LEXICAL_FILENAME, chunks.iter_entries())
+    finally:
+        chunks.close()
+    save_search_index(vector_db, path, index_type)
+    # Stores written before the chunk store existed kept the docstore in a pickle
+    (path / "index.pkl").unlink(missing_ok=True)
+
+
+def store_version(path: Path):
+    """Returns a fingerprint that changes whenever the vector store is rewritten."""
+    try:
+        stat = (Path(path) / ChunkStore.FILENAME).stat()
+    except FileNotFoundError:
+        return None
+    # The chunk store is replaced on every save, which gives it a new inode and mtime
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def has_chunk_store(path: Path) -> bool:
+    """Returns True if the directory holds a vector store in the current on-disk format."""
+    return (Path(path) / ChunkStore.FILENAME).exists() and search_index_path(path, "flat").exists()
+
+
+def load_vector_store(
+    path: Path,
+    embedding_model,
+    index_type: str = config.FAISS_INDEX_TYPE,
+    mmap: bool = config.FAISS_MMAP,
+) -> FAISS:
+    """Opens a saved vector store for querying.
+
+    Only the FAISS index and the chunk store header are read; chunks are fetched on demand.
+    """
+    path = Path(path)
+    if not has_chunk_store(path):
+        raise FileNotFoundError(
+            f"No chunk store found in {path}. Please re-run `ingest.py` to rebuild the vector store."
+        )
+    index_file = search_index_path(path, index_type)
+    if not index_file.exists():
+        logging.warning(f"No {index_type} index found at {index_file}; using the flat index.")
+        index_type = "flat"
+        index_file = search_index_path(path, index_type)
+
+    flags = 0
+    if mmap:
+        # Vectors stay on disk and are paged in on demand (and shared between processes).
+        # IVF inverted lists are mapped with IO_FLAG_MMAP; flat codes need IO_FLAG_MMAP_IFC (faiss>=1.9).
+        if index_type in ("ivf", "ivfpq"):
+            flags = faiss.IO_FLAG_MMAP
+        else:
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index(str(index_file), flags)
+    apply_search_params(index)
+
+    store = ChunkStore(path / ChunkStore.FILENAME)
+    if len(store) != index.ntotal:
+        raise ValueError(f"Chunk store has {len(store)} chunks but the index has {index.ntotal} vectors.")
+    logging.info(f"Loaded {type(index).__name__} with {index.ntotal} vectors (mmap={mmap}).")
+    return FAISS(embedding_model, index, store, PositionMap(store))
+
+
+def search_positions(vector_db: FAISS, embeddings: List[List[float]], k: int) -> List[List[int]]:
+    """Runs one FAISS search over a matrix of query embeddings; returns the index positions per query."""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vector_db._normalize_L2:
+        faiss.normalize_L2(vectors)
+    _, positions = vector_db.index.search(vectors, k)
+    return [[int(position) for position in row if position != -1] for row in positions]
+
+
+def documents_at(vector_db: FAISS, positions: List[int]) -> List[Document]:
+    """Returns the chunks stored at the given index positions, in the same order."""
+    # The chunk store and the corpus's sharded chunk store fetch all positions in one query each
+    if hasattr(vector_db.docstore, "get_by_positions"):
+        found = vector_db.docstore.get_by_positions(positions)
+        return [found[position] for position in positions if position in found]
+    docs = [vector_db.docstore.search(vector_db.index_to_docstore_id[position]) for position in positions]
+    return [doc for doc in docs if isinstance(doc, Document)]
+
+
+def load_editable_vector_store(path: Path, embedding_model) -> FAISS:
+    """Loads the exact index and all chunks into memory so ingestion can add and delete entries."""
+    path = Path(path)
+    index = faiss.read_index(str(search_index_path(path, "flat")))
+    store = ChunkStore(path / ChunkStore.FILENAME)
+    docstore = InMemoryDocstore()
+    index_to_docstore_id = {}
+    for position, doc_id, doc in store.iter_entries():
+        index_to_docstore_id[position] = doc_id
+        docstore.add({doc_id: doc})
+    return FAISS(embedding_model, index, docstore, index_to_docstore_id)
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Returns the serialized size of an index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def load_flat_vectors(path: Path) -> Optional[np.ndarray]:
+    """Reads the exact vectors of a saved vector store, if it exists."""
+    index_file = search_index_path(path, "flat")
+    if not index_file.exists():
+        return None
+    return flat_vectors(faiss.read_index(str(index_file)))
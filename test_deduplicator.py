@@ -0,0 +1,23 @@
+# test_deduplicator.py
+from src.deduplicator import furniture_key, strip_furniture
+
+
+def test_numeric_table_rows_survive_furniture_stripping():
+    """Bare numbers (INS codes, limits, page numbers) are content, even when they repeat across pages."""
+    text = (
+        "FSSAI Compendium\n"
+        "Sorbic acid\n200\n1000\n"
+        "Benzoic acid\n210\n250\n"
+        "Page 1 of 300\n"
+        "1\n"
+    )
+    furniture = {furniture_key("FSSAI Compendium"), furniture_key("Page 7 of 300"), furniture_key("7")}
+    assert strip_furniture(text, furniture, edge_lines=3).splitlines() == [
+        "Sorbic acid", "200", "1000", "Benzoic acid", "210", "250", "1",
+    ]
+
+
+def test_furniture_is_only_stripped_at_the_page_edges():
+    text = "FSSAI Compendium\nIntro\nRow 1\nRow 2\nFSSAI Compendium\nRow 3\nRow 4\nEnd\nFSSAI Compendium\n"
+    stripped = strip_furniture(text, {furniture_key("FSSAI Compendium")}, edge_lines=2)
+    assert stripped.splitlines() == ["Intro", "Row 1", "Row 2", "FSSAI Compendium", "Row 3", "Row 4", "End"]